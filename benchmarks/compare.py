@@ -0,0 +1,63 @@
+"""Compare two result files of `benchmarks/suite.py`.
+
+Cases are matched by their parameters, and the ratio of the new to the
+old wall time and peak resident set size is reported for each of them.
+Cases of the old results that are missing from the new ones, e.g.,
+because they crashed, are reported and count as regressions.
+
+Usage::
+
+    python benchmarks/compare.py old.json new.json [--threshold 1.1]
+"""
+import argparse
+import json
+import sys
+
+
+MEASUREMENTS = ('time', 'count', 'throughput', 'setup_rss_mb', 'peak_rss_mb')
+
+
+def _key(res):
+    return tuple(sorted((k, v) for k, v in res.items()
+                        if k not in MEASUREMENTS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='time ratio above which a case is a regression')
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    print(f'old: {old["meta"]["commit"]} ({old["meta"]["date"]})')
+    print(f'new: {new["meta"]["commit"]} ({new["meta"]["date"]})')
+    before = {_key(res): res for res in old['results']}
+    regressions = 0
+    for res in new['results']:
+        ref = before.pop(_key(res), None)
+        if ref is None:
+            continue
+        ratio = res['time'] / ref['time']
+        rss = res['peak_rss_mb'] / ref['peak_rss_mb']
+        flag = ''
+        if ratio > args.threshold:
+            flag = '  slower'
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            flag = '  faster'
+        label = ' '.join(f'{v}' for k, v in _key(res) if v is not None)
+        print(f'{label:40s} time x{ratio:6.2f}  rss x{rss:5.2f}{flag}')
+    for key in before:  # not matched by any new result
+        label = ' '.join(f'{v}' for k, v in key if v is not None)
+        print(f'{label:40s} missing')
+        regressions += 1
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Import time of the package.
+
+Every measurement runs `import pspd` in a fresh interpreter with
+`-X importtime` and reports the total and the slowest modules
+imported by the package. It also checks that the heavy optional
+dependencies are not imported as a side effect.
+
+Usage::
+
+    python benchmarks/import_time.py [--repeat 5] [--top 10]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+HEAVY = ('open3d', 'tqdm', 'scipy.interpolate', 'scipy.integrate')
+
+
+def measure():
+    code = ('import sys, pspd; '
+            f'print(",".join(m for m in {HEAVY!r} if m in sys.modules))')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, check=True)
+    times = dict()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 2:  # the package and what it imports directly
+            times[name.strip()] = int(cumulative_us)
+    return times, [m for m in proc.stdout.strip().split(',') if m]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.repeat)]
+    totals = [times['pspd'] / 1e3 for times, _ in runs]
+    print(f'import pspd: median {statistics.median(totals):.1f} ms, '
+          f'min {min(totals):.1f} ms over {args.repeat} runs')
+    times, heavy = runs[-1]
+    slowest = sorted(times.items(), key=lambda kv: -kv[1])
+    for name, us in slowest[1:args.top+1]:
+        print(f'{us / 1e3:10.1f} ms  {name}')
+    if heavy:
+        print('imported as a side effect:', ', '.join(heavy))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""Benchmarks of the hot paths of the package.
+
+Every case runs in a fresh interpreter so that its peak resident set
+size is not affected by the other cases. Geometries are synthetic
+spheres and ellipsoids of scalable size, in centimeters, and the head
+point cloud shipped in `playground/input/data`, with the power density
+from `playground/single_source.py`. The results are stored as JSON and
+can be compared between versions by `benchmarks/compare.py`. Another
+version of the package, e.g., a checkout of the previous release, is
+benchmarked by passing its source directory. Cases that rely on options
+missing from that version are skipped.
+
+Usage::
+
+    python benchmarks/suite.py [--sizes 2000 8000] [--output out.json]
+    python benchmarks/suite.py --src ../pspd-old/src --output old.json
+"""
+import argparse
+import datetime
+import inspect
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = ('remove_hidden_points',
+              'estimate_normals',
+              'orient_normals',
+              'edblquad',
+              'find')
+GEOMETRIES = ('sphere', 'ellipsoid', 'head')
+MODES = ('cloud', 'mesh')
+PROJECTED_AREA = 4  # cm2
+UNSUPPORTED = 3  # exit code of a case that the version does not support
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _rss_mb():
+    # kilobytes on Linux, bytes on macOS
+    scale = 1024 ** 2 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _accepts(func, name):
+    return name in inspect.signature(func).parameters
+
+
+def fibonacci_sphere(size):
+    i = np.arange(size) + 0.5
+    phi = np.arccos(1 - 2 * i / size)
+    theta = np.pi * (1 + 5 ** 0.5) * i
+    return np.c_[np.cos(theta) * np.sin(phi),
+                 np.sin(theta) * np.sin(phi),
+                 np.cos(phi)]
+
+
+def geometry(name, size):
+    """Return the points and, for convex geometries, the triangles of
+    the surface."""
+    from scipy import spatial
+
+    if name == 'head':
+        fname = os.path.join(ROOT, 'playground', 'input', 'data', 'head.xyz')
+        return np.loadtxt(fname) * 100, None  # m to cm
+    semiaxes = {'sphere': [10, 10, 10], 'ellipsoid': [12, 9, 7]}[name]
+    points = fibonacci_sphere(size) * semiaxes
+    triangles = spatial.ConvexHull(points).simplices
+    v = points[triangles]
+    normal = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    flip = np.sum(normal * v.mean(axis=1), axis=1) < 0  # centered at origin
+    triangles[flip] = triangles[flip][:, ::-1]
+    return points, triangles
+
+
+def power_density(points):
+    sys.path.insert(0, os.path.join(ROOT, 'playground'))
+    from single_source import generate_power_density
+
+    query_point = points[np.argmax(points[:, 0])]
+    return generate_power_density(10, 2.5, query_point, points,
+                                  [1, 0.5, 0.25])
+
+
+def run_case(case):
+    """Run a single benchmark case and return its measurements."""
+    import pspd.misc
+    import pspd.normals
+    import pspd.points
+
+    # options added over time, missing from earlier versions
+    has_method = _accepts(pspd.normals.orient_normals, 'method')
+    has_engine = _accepts(pspd.misc.edblquad, 'engine')
+    name = case['benchmark']
+    if (name == 'orient_normals') and (case['method'] != 'open3d'):
+        if not has_method:
+            raise Unsupported('orient_normals(method=...)')
+    if (name == 'edblquad') and (case['engine'] != 'spline'):
+        if not has_engine:
+            raise Unsupported('edblquad(engine=...)')
+
+    points, triangles = geometry(case['geometry'], case['size'])
+    pov = points.mean(axis=0)
+    pov[0] += 2 * np.linalg.norm(np.ptp(points, axis=0))
+    k = 21
+    if name in ('orient_normals', 'edblquad', 'find'):
+        normals = pspd.normals.estimate_normals(
+            points, k, unit=False, orient='mst' if has_method else True
+        )
+    if name == 'edblquad':  # local frames of randomly chosen points
+        from scipy import spatial
+
+        rng = np.random.default_rng(0)
+        query = rng.choice(points.shape[0], 200, replace=False)
+        a = np.sqrt(PROJECTED_AREA)
+        balls = spatial.KDTree(points).query_ball_point(points[query],
+                                                        np.sqrt(2) / 2 * a)
+        values = power_density(points)
+        patches = []
+        for ind in balls:
+            X = points[ind] - points[ind].mean(axis=0)
+            U, _, _ = np.linalg.svd(X.T @ X)
+            Xt = X @ U
+            inside = np.all(np.abs(Xt[:, :2]) <= a / 2, axis=1)
+            patches.append((Xt[inside, :2], values[ind][inside]))
+        kwargs = {'engine': case['engine']} if has_engine else {}
+    if name == 'find':
+        from pspd import PSPD
+
+        pd = power_density(points)
+        mesh = None
+        if case['mode'] == 'mesh':
+            import open3d as o3d
+
+            mesh = o3d.geometry.TriangleMesh(
+                o3d.utility.Vector3dVector(points),
+                o3d.utility.Vector3iVector(triangles.astype(np.int32)),
+            )
+        instance = PSPD(points, pd, normals=normals, mesh=mesh)
+    if name == 'edblquad':  # lazy imports are not timed
+        pspd.misc.edblquad(*patches[0], **kwargs)
+    setup_rss = _rss_mb()
+
+    start = time.perf_counter()
+    if name == 'remove_hidden_points':
+        count = pspd.points.remove_hidden_points(points, pov).size
+    elif name == 'estimate_normals':
+        pspd.normals.estimate_normals(points, k, unit=False)
+        count = points.shape[0]
+    elif name == 'orient_normals':
+        if has_method:
+            pspd.normals.orient_normals(points, normals, k, case['method'])
+        else:
+            pspd.normals.orient_normals(points, normals, k)
+        count = points.shape[0]
+    elif name == 'edblquad':
+        for xy, v in patches:
+            pspd.misc.edblquad(xy, v, **kwargs)
+        count = len(patches)
+    elif name == 'find':
+        instance.find(PROJECTED_AREA, pov=pov, p=np.pi)
+        count = instance.points_visible.shape[0]
+    elapsed = time.perf_counter() - start
+    return dict(case,
+                time=elapsed,
+                count=count,
+                throughput=count / elapsed,
+                setup_rss_mb=setup_rss,
+                peak_rss_mb=_rss_mb())
+
+
+def cases(args):
+    for name, geom in itertools.product(args.benchmarks, args.geometries):
+        sizes = [None] if geom == 'head' else args.sizes
+        for size in sizes:
+            base = {'benchmark': name, 'geometry': geom, 'size': size}
+            if name == 'orient_normals':
+                for method in args.orient:
+                    yield dict(base, method=method)
+            elif name == 'edblquad':
+                for engine in args.engines:
+                    yield dict(base, engine=engine)
+            elif name == 'find':
+                for mode in args.modes:
+                    if (mode == 'mesh') and (geom == 'head'):
+                        continue  # no mesh shipped with the point cloud
+                    yield dict(base, mode=mode)
+            else:
+                yield base
+
+
+def metadata(src):
+    import numpy
+    import scipy
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                cwd=src, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'date': datetime.datetime.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'scipy': scipy.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--benchmarks', nargs='+', default=BENCHMARKS,
+                        choices=BENCHMARKS)
+    parser.add_argument('--geometries', nargs='+', default=GEOMETRIES,
+                        choices=GEOMETRIES)
+    parser.add_argument('--sizes', nargs='+', type=int,
+                        default=[2000, 8000],
+                        help='number of points of synthetic geometries, at '
+                             'least 2000 for enough points per spline fit')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--engines', nargs='+', default=['spline', 'rbf'])
+    parser.add_argument('--orient', nargs='+', default=['mst', 'open3d'])
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='the fastest of repeated runs is kept')
+    parser.add_argument('--output', default='benchmarks.json')
+    parser.add_argument('--src', default=os.path.join(ROOT, 'src'),
+                        help='source directory of the benchmarked version')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:  # worker process
+        try:
+            print(json.dumps(run_case(json.loads(args.case))))
+        except Unsupported as e:
+            print(f'Unsupported by this version: {e}', file=sys.stderr)
+            sys.exit(UNSUPPORTED)
+        return
+
+    src = os.path.abspath(args.src)
+    env = dict(os.environ)
+    path = [src, env.get('PYTHONPATH', '')]
+    env['PYTHONPATH'] = os.pathsep.join(path)
+    results = []
+    for case in cases(args):
+        runs = []
+        for _ in range(args.repeat):
+            proc = subprocess.run([sys.executable, __file__,
+                                   '--case', json.dumps(case)],
+                                  capture_output=True, text=True, env=env)
+            if proc.returncode == UNSUPPORTED:
+                break
+            if proc.returncode:
+                print(proc.stderr, file=sys.stderr)
+                break
+            runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        label = ' '.join(f'{v}' for k, v in case.items() if v is not None)
+        if not runs:
+            status = ('unsupported' if proc.returncode == UNSUPPORTED
+                      else 'failed')
+            print(f'{label:40s} {status}')
+            continue
+        res = min(runs, key=lambda r: r['time'])
+        results.append(res)
+        print(f'{label:40s} {res["time"]:9.3f} s '
+              f'{res["throughput"]:12.1f} /s '
+              f'{res["peak_rss_mb"]:9.1f} MB')
+    with open(args.output, 'w') as f:
+        json.dump({'meta': metadata(src), 'results': results}, f, indent=2)
+    print(f'Results saved to `{args.output}`.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import os
+import time
+
+import numpy as np
+from pspd import PSPD
+from pspd.io import load
+
+from single_source import generate_power_density
+
+
+# constants
+AMPLITUDE = 10  # W/m2
+RADIUS = 2.5   # cm
+QUERY_POINT = np.array([8.4082, -3.0716, -1.8224])  # cm
+PROJECTED_AREA = 4  # cm2
+SCALER = [1, 0.5, 0.25]
+N_SCENARIOS = 100
+
+
+def main():
+    # data
+    fname = os.path.join('input', 'data', 'head.scaled')
+    points = load(fname + '.xyz')
+
+    # generate power density
+    power_density = generate_power_density(AMPLITUDE,
+                                           RADIUS,
+                                           QUERY_POINT,
+                                           points,
+                                           SCALER)
+
+    # search space
+    pov = np.mean(points, axis=0)
+    diameter = np.linalg.norm(np.ptp(points, axis=0))
+    pov[0] += 2 * diameter
+    pov[1] += 0.5 * diameter
+
+    # reference, spline-based spatial averaging
+    pspd = PSPD(points, power_density)
+    start_time = time.perf_counter()
+    pspd.find(PROJECTED_AREA, pov=pov, p=np.pi)
+    elapsed_find = time.perf_counter() - start_time
+    spd_ref = pspd.results['spatially averaged power density']
+
+    # sparse averaging operator, assembled once for the geometry
+    start_time = time.perf_counter()
+    W = pspd.assemble_operator(PROJECTED_AREA, pov=pov, p=np.pi)
+    elapsed_assemble = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    spd = W @ pspd.power_density_n
+    elapsed_apply = time.perf_counter() - start_time
+
+    # many exposure scenarios at once
+    rng = np.random.default_rng(0)
+    centers = points[pspd.query_ind[rng.integers(0, W.shape[0],
+                                                 N_SCENARIOS)]]
+    fields = np.stack([generate_power_density(AMPLITUDE,
+                                              RADIUS,
+                                              c,
+                                              points,
+                                              SCALER)
+                       for c in centers], axis=1)
+    start_time = time.perf_counter()
+    W @ fields
+    elapsed_stack = time.perf_counter() - start_time
+
+    # report
+    print(f'find (spline): {elapsed_find:.2f} s')
+    print(f'operator assembly: {elapsed_assemble:.2f} s, '
+          f'{W.nnz} non-zeros')
+    print(f'operator application: {elapsed_apply * 1e3:.2f} ms per field, '
+          f'{elapsed_stack / N_SCENARIOS * 1e3:.2f} ms per field '
+          f'for {N_SCENARIOS} fields at once')
+    err = np.abs(spd - spd_ref) / spd_ref.max()
+    print(f'error relative to the peak: max {err.max():.2e}, '
+          f'mean {err.mean():.2e}')
+    print(f'pspd: {spd.max():.6f} (operator), '
+          f'{spd_ref.max():.6f} (spline) W/m2')
+    dist = np.linalg.norm(points[pspd.query_ind[np.argmax(spd)]]
+                          - points[pspd.query_ind[np.argmax(spd_ref)]])
+    print(f'distance between peak locations: {dist:.4f} cm')
+
+
+if __name__ == '__main__':
+    main()
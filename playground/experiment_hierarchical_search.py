@@ -0,0 +1,64 @@
+import os
+import time
+
+import numpy as np
+from pspd import PSPD
+from pspd.io import load
+
+from single_source import generate_power_density
+
+
+# constants
+AMPLITUDE = 10  # W/m2
+RADIUS = 2.5   # cm
+QUERY_POINT = np.array([8.4082, -3.0716, -1.8224])  # cm
+PROJECTED_AREA = 4  # cm2
+SCALER = [1, 0.5, 0.25]
+
+
+def main():
+    # data
+    fname = os.path.join('input', 'data', 'head.scaled')
+    points = load(fname + '.xyz')
+
+    # generate power density
+    power_density = generate_power_density(AMPLITUDE,
+                                           RADIUS,
+                                           QUERY_POINT,
+                                           points,
+                                           SCALER)
+
+    # search space
+    pov = np.mean(points, axis=0)
+    diameter = np.linalg.norm(np.ptp(points, axis=0))
+    pov[0] += 2 * diameter
+    pov[1] += 0.5 * diameter
+
+    # exhaustive vs. coarse-to-fine search
+    pspd = PSPD(points, power_density)
+    elapsed = dict()
+    res = dict()
+    for mode in ['exhaustive', 'hierarchical']:
+        start_time = time.perf_counter()
+        pspd.find(PROJECTED_AREA, mode=mode, pov=pov, p=np.pi)
+        elapsed[mode] = time.perf_counter() - start_time
+        res[mode] = pspd.get_results()
+        res[mode]['evaluated'] = len(pspd.results['query point'])
+
+    # report
+    for mode in ['exhaustive', 'hierarchical']:
+        print(f"{mode:>12}: {elapsed[mode]:8.2f} s, "
+              f"{res[mode]['evaluated']:6d} query points, "
+              f"pspd = {res[mode]['spatially averaged power density']:.6f} "
+              "W/m2")
+    print(f"speedup: {elapsed['exhaustive'] / elapsed['hierarchical']:.1f}x")
+    spd_e = res['exhaustive']['spatially averaged power density']
+    spd_h = res['hierarchical']['spatially averaged power density']
+    print(f'relative difference in pspd: {abs(spd_h - spd_e) / spd_e:.2e}')
+    dist = np.linalg.norm(res['hierarchical']['query point']
+                          - res['exhaustive']['query point'])
+    print(f'distance between peak locations: {dist:.4f} cm')
+
+
+if __name__ == '__main__':
+    main()
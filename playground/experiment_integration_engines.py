@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+from pspd import PSPD
+from pspd.io import load
+
+from single_source import generate_power_density
+
+
+# constants
+AMPLITUDE = 10  # W/m2
+RADIUS = 2.5   # cm
+QUERY_POINT = np.array([8.4082, -3.0716, -1.8224])  # cm
+PROJECTED_AREA = 4  # cm2
+SCALER = [1, 0.5, 0.25]
+ENGINES = ['spline', 'delaunay', 'voronoi', 'rbf']
+
+
+def main():
+    # data
+    fname = os.path.join('input', 'data', 'head.scaled')
+    points = load(fname + '.xyz')
+
+    # generate power density
+    power_density = generate_power_density(AMPLITUDE,
+                                           RADIUS,
+                                           QUERY_POINT,
+                                           points,
+                                           SCALER)
+
+    # search space
+    pov = np.mean(points, axis=0)
+    diameter = np.linalg.norm(np.ptp(points, axis=0))
+    pov[0] += 2 * diameter
+    pov[1] += 0.5 * diameter
+
+    # exhaustive search with each integration engine
+    pspd = PSPD(points, power_density)
+    elapsed = dict()
+    spd = dict()
+    for engine in ENGINES:
+        start_time = time.perf_counter()
+        pspd.find(PROJECTED_AREA, engine=engine, pov=pov, p=np.pi)
+        elapsed[engine] = time.perf_counter() - start_time
+        spd[engine] = np.array(pspd.results['spatially averaged power density'])
+
+    # report, spline is the reference
+    spd_ref = spd['spline']
+    peak_ref = points[pspd.query_ind[np.argmax(spd_ref)]]
+    for engine in ENGINES:
+        err = np.abs(spd[engine] - spd_ref) / spd_ref.max()
+        dist = np.linalg.norm(points[pspd.query_ind[np.argmax(spd[engine])]]
+                              - peak_ref)
+        print(f'{engine:>8}: {elapsed[engine]:8.2f} s, '
+              f'pspd = {spd[engine].max():.6f} W/m2, '
+              f'error relative to the peak: max {err.max():.2e}, '
+              f'mean {err.mean():.2e}, '
+              f'distance between peak locations: {dist:.4f} cm')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,11 @@
+import logging
 import os
 
 import numpy as np
 import open3d as o3d
 import pickle
 from pspd import PSPD
+from pspd.io import load
 
 from single_source import generate_power_density
 
@@ -17,10 +19,12 @@ SCALER = [1, 0.5, 0.25]
 
 
 def main():
+    logging.basicConfig(level=logging.INFO)
+
     # data
     fname = os.path.join('input', 'data', 'head.scaled')
-    points = np.loadtxt(fname + '.xyz') 
-    normals = np.loadtxt(fname + '.normals')
+    points = load(fname + '.xyz')
+    normals = load(fname + '.normals')
     mesh = o3d.io.read_triangle_mesh(fname + '.iso.watertight.off')
     vert = np.asarray(mesh.vertices)
     tri = np.asarray(mesh.triangles)
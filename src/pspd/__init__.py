@@ -1,3 +1,7 @@
+import logging
 
 from .main import PSPD
 
+
+# the caller configures logging, e.g., by `logging.basicConfig`
+logging.getLogger(__name__).addHandler(logging.NullHandler())
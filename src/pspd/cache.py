@@ -0,0 +1,136 @@
+import hashlib
+import os
+
+import numpy as np
+
+
+class GeometryCache(object):
+    """Persistent on-disk cache of arrays that depend only on the
+    geometry, e.g., normals, ball neighbourhoods and local frames.
+
+    Every entry is stored as a `.npy` file in a subdirectory named
+    after a hash of the data and parameters it was computed from, and
+    is memory-mapped when loaded so that repeated runs, and all worker
+    processes of a single run, share the same pages.
+    """
+    def __init__(self, directory):
+        """Constructor.
+
+        Parameters
+        ----------
+        directory : str
+            Path to the cache directory. It is created if it does not
+            exist.
+        """
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __str__(self):
+        return f'Geometry cache at {self.directory}'
+
+    def __repr__(self):
+        return self.__str__()
+
+    @staticmethod
+    def key(*arrays, **params):
+        """Return a hash of the given arrays and parameters.
+
+        Parameters
+        ----------
+        arrays : tuple
+            Arrays whose content, shape and data type identify the
+            entry.
+        params : dict
+            Additional parameters, e.g., the number of nearest
+            neighbours or the radius of the ball neighbourhood.
+
+        Returns
+        -------
+        str
+            Hexadecimal digest.
+        """
+        h = hashlib.sha256()
+        for arr in arrays:
+            arr = np.ascontiguousarray(arr)
+            h.update(f'{arr.shape}{arr.dtype.str}'.encode())
+            h.update(arr.data)
+        for name in sorted(params):
+            value = params[name]
+            if isinstance(value, np.ndarray):
+                value = (value.shape, value.dtype.str, value.tobytes())
+            h.update(f'{name}={value!r};'.encode())
+        return h.hexdigest()[:32]
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, key, f'{name}.npy')
+
+    def load(self, key, names):
+        """Memory-map cached arrays.
+
+        Parameters
+        ----------
+        key : str
+            Hash of the entry, see `key`.
+        names : list
+            Names of the arrays.
+
+        Returns
+        -------
+        dict or None
+            Read-only memory-mapped arrays keyed by name, or None if
+            any of them is missing.
+        """
+        paths = [self._path(key, name) for name in names]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        return {name: np.load(path, mmap_mode='r')
+                for name, path in zip(names, paths)}
+
+    def save(self, key, arrays):
+        """Store arrays so that they can later be memory-mapped.
+
+        Each file is written under a temporary name first and then
+        moved in place, so that concurrent runs never see a partially
+        written entry.
+
+        Parameters
+        ----------
+        key : str
+            Hash of the entry, see `key`.
+        arrays : dict
+            Arrays keyed by name.
+        """
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        for name, arr in arrays.items():
+            path = self._path(key, name)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, np.ascontiguousarray(arr))
+            os.replace(tmp, path)
+
+    def get(self, key, names, func):
+        """Memory-map cached arrays or compute and store them first.
+
+        Parameters
+        ----------
+        key : str
+            Hash of the entry, see `key`.
+        names : list
+            Names of the arrays.
+        func : callable
+            Called without arguments on a cache miss, it should return
+            the arrays in the order of `names`.
+
+        Returns
+        -------
+        dict
+            Read-only memory-mapped arrays keyed by name.
+        """
+        arrays = self.load(key, names)
+        if arrays is None:
+            out = func()
+            if len(names) == 1:
+                out = (out, )
+            self.save(key, dict(zip(names, out)))
+            arrays = self.load(key, names)
+        return arrays
@@ -0,0 +1,427 @@
+import os
+import sys
+import zipfile
+
+import numpy as np
+
+
+# PLY scalar types and their NumPy counterparts
+_PLY_TYPES = {'char': 'i1', 'int8': 'i1',
+              'uchar': 'u1', 'uint8': 'u1',
+              'short': 'i2', 'int16': 'i2',
+              'ushort': 'u2', 'uint16': 'u2',
+              'int': 'i4', 'int32': 'i4',
+              'uint': 'u4', 'uint32': 'u4',
+              'float': 'f4', 'float32': 'f4',
+              'double': 'f8', 'float64': 'f8'}
+
+# vertex properties of the PLY files written by `write_ply`
+_PLY_VERTEX = {'points': ('x', 'y', 'z'),
+               'normals': ('nx', 'ny', 'nz'),
+               'power_density': ('power_density', )}
+
+
+def _ext(fname):
+    return os.path.splitext(fname)[1].lower()
+
+
+def read_xyz(fname, dtype=np.float64, chunk_size=1 << 24, out=None):
+    """Return the array stored in a whitespace-delimited text file,
+    e.g., a legacy `.xyz` or `.normals` file.
+
+    The file is read twice in blocks of `chunk_size` bytes: first to
+    count the rows and then to parse the blocks directly into the
+    preallocated output, so that the memory footprint does not exceed
+    the output and a single block.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file.
+    dtype : numpy.dtype, optional
+        Floating-point type of the output.
+    chunk_size : int, optional
+        Number of bytes read at once.
+    out : numpy.ndarray, optional
+        Preallocated array of shape (N, C), e.g., a `numpy.memmap`, N
+        is the number of rows and C is the number of columns.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (N, C).
+    """
+    with open(fname, 'rb') as f:
+        ncols = len(f.readline().split())
+        f.seek(0)
+        nrows = 0
+        last = b'\n'
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                break
+            nrows += buf.count(b'\n')
+            last = buf[-1:]
+        nrows += last != b'\n'  # no newline after the last row
+        if out is None:
+            out = np.empty((nrows, ncols), dtype=dtype)
+        flat = out.reshape(-1)
+        f.seek(0)
+        i = 0
+        rest = b''
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                buf, rest = rest, b''
+            else:
+                buf = rest + buf
+                cut = buf.rfind(b'\n') + 1
+                buf, rest = buf[:cut], buf[cut:]
+            if not buf.strip():
+                if not rest:
+                    break
+                continue
+            values = np.fromstring(buf, dtype=out.dtype, sep=' ')
+            flat[i:i+values.size] = values
+            i += values.size
+    if i % ncols:
+        raise ValueError('Rows have different numbers of columns')
+    return out[:i // ncols]  # blank lines were counted as rows
+
+
+def write_xyz(fname, arr):
+    """Store an array as a whitespace-delimited text file.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file.
+    arr : numpy.ndarray
+        Array of shape (N, C).
+    """
+    np.savetxt(fname, arr)
+
+
+def load_npz(fname, mmap_mode='r'):
+    """Return the arrays stored in a `.npz` archive.
+
+    Arrays stored without compression, e.g., by `save_npz`, are
+    memory-mapped directly from the archive instead of being read.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the archive.
+    mmap_mode : str, optional
+        Memory-mapping mode, see `numpy.memmap`. If None, all arrays
+        are read into memory.
+
+    Returns
+    -------
+    dict
+        Arrays keyed by name.
+    """
+    arrays = dict()
+    with zipfile.ZipFile(fname) as zf, open(fname, 'rb') as f:
+        for info in zf.infolist():
+            name = info.filename[:-4] if info.filename.endswith('.npy') \
+                else info.filename
+            stored = info.compress_type == zipfile.ZIP_STORED
+            if (mmap_mode is None) or not stored:
+                with zf.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # skip the local file header to the beginning of the .npy file
+            f.seek(info.header_offset + 26)
+            n, m = np.frombuffer(f.read(4), dtype='<u2').tolist()
+            f.seek(info.header_offset + 30 + n + m)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran, dtype = header
+            arrays[name] = np.memmap(fname, dtype=dtype, mode=mmap_mode,
+                                     offset=f.tell(), shape=shape,
+                                     order='F' if fortran else 'C')
+    return arrays
+
+
+def save_npz(fname, **arrays):
+    """Store arrays in an uncompressed `.npz` archive that can be
+    memory-mapped by `load_npz`.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the archive.
+    arrays : dict
+        Arrays keyed by name.
+    """
+    np.savez(fname, **arrays)
+
+
+def read_ply(fname, mmap_mode='r'):
+    """Return the vertices, normals, power density and triangles stored
+    in a binary PLY file.
+
+    Vertex properties are returned as strided views of the memory-mapped
+    file, i.e., without copying, as long as the properties of each
+    group are stored next to each other with the same type.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file.
+    mmap_mode : str, optional
+        Memory-mapping mode, see `numpy.memmap`. If None, the file is
+        read into memory.
+
+    Returns
+    -------
+    dict
+        Arrays keyed by `points`, `normals`, `power_density` and
+        `triangles`, whichever are stored in the file.
+    """
+    with open(fname, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError('Not a PLY file')
+        elements = []
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError('Incomplete PLY header')
+            words = line.decode('ascii').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'format':
+                if words[1] == 'binary_little_endian':
+                    order = '<'
+                elif words[1] == 'binary_big_endian':
+                    order = '>'
+                else:
+                    raise ValueError('Only binary PLY files are supported')
+            elif words[0] == 'element':
+                elements.append((words[1], int(words[2]), []))
+            elif words[0] == 'property':
+                elements[-1][2].append(words[1:])
+            elif words[0] == 'end_header':
+                break
+        offset = f.tell()
+    if mmap_mode is None:
+        with open(fname, 'rb') as f:
+            buf = np.frombuffer(f.read(), dtype=np.uint8)
+    else:
+        buf = np.memmap(fname, dtype=np.uint8, mode=mmap_mode)
+
+    arrays = dict()
+    for name, count, props in elements:
+        if name == 'face':
+            if (len(props) != 1) or (props[0][0] != 'list'):
+                raise ValueError('Unsupported face element')
+            dtype = np.dtype([('n', order + _PLY_TYPES[props[0][1]]),
+                              ('v', order + _PLY_TYPES[props[0][2]], 3)])
+            face = np.ndarray((count, ), dtype=dtype, buffer=buf,
+                              offset=offset)
+            if np.any(face['n'] != 3):
+                raise ValueError('Only triangular faces are supported')
+            arrays['triangles'] = face['v']
+            offset += count * dtype.itemsize
+            continue
+        if any(p[0] == 'list' for p in props):
+            raise ValueError(f'Unsupported list property in `{name}`')
+        dtype = np.dtype([(p[1], order + _PLY_TYPES[p[0]]) for p in props])
+        if name == 'vertex':
+            for key, names in _PLY_VERTEX.items():
+                if not all(n in dtype.names for n in names):
+                    continue
+                t, first = dtype.fields[names[0]][:2]
+                strided = all(
+                    dtype.fields[n][:2] == (t, first + i * t.itemsize)
+                    for i, n in enumerate(names)
+                )
+                if strided:
+                    arr = np.ndarray((count, len(names)), dtype=t,
+                                     buffer=buf, offset=offset + first,
+                                     strides=(dtype.itemsize, t.itemsize))
+                else:  # scattered or mixed properties are copied
+                    rec = np.ndarray((count, ), dtype=dtype, buffer=buf,
+                                     offset=offset)
+                    arr = np.stack([rec[n] for n in names], axis=1)
+                arrays[key] = arr[:, 0] if len(names) == 1 else arr
+        offset += count * dtype.itemsize
+    return arrays
+
+
+def write_ply(fname,
+              points,
+              normals=None,
+              power_density=None,
+              triangles=None):
+    """Store a point cloud or a triangle mesh in a binary PLY file.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file.
+    points : numpy.ndarray
+        Points or vertices of shape (N, 3).
+    normals : numpy.ndarray, optional
+        Normals of shape (N, 3).
+    power_density : numpy.ndarray, optional
+        Power density of shape (N, ).
+    triangles : numpy.ndarray, optional
+        Triangles given by the indices to the vertices of shape (T, 3).
+    """
+    ftype = 'float' if np.asarray(points).dtype == np.float32 else 'double'
+    columns = {'points': points,
+               'normals': normals,
+               'power_density': power_density}
+    fields = []
+    for key, names in _PLY_VERTEX.items():
+        if columns[key] is not None:
+            fields += [(n, '<' + _PLY_TYPES[ftype]) for n in names]
+    vertex = np.empty(len(points), dtype=fields)
+    for key, names in _PLY_VERTEX.items():
+        if columns[key] is not None:
+            arr = np.asarray(columns[key]).reshape(len(points), -1)
+            for i, n in enumerate(names):
+                vertex[n] = arr[:, i]
+    header = ['ply',
+              'format binary_little_endian 1.0',
+              f'element vertex {len(points)}']
+    header += [f'property {ftype} {n}' for n, _ in fields]
+    if triangles is not None:
+        face = np.empty(len(triangles), dtype=[('n', 'u1'), ('v', '<i4', 3)])
+        face['n'] = 3
+        face['v'] = triangles
+        header += [f'element face {len(triangles)}',
+                   'property list uchar int vertex_indices']
+    header.append('end_header')
+    with open(fname, 'wb') as f:
+        f.write(('\n'.join(header) + '\n').encode('ascii'))
+        f.write(vertex.tobytes())
+        if triangles is not None:
+            f.write(face.tobytes())
+
+
+def load(fname, mmap_mode='r'):
+    """Load a point cloud, normals, power density or a triangle mesh
+    depending on the file extension.
+
+    `.npy` files are memory-mapped, `.npz` archives and binary `.ply`
+    files are memory-mapped as described in `load_npz` and `read_ply`,
+    and any other extension, e.g., `.xyz` or `.normals`, is parsed as
+    whitespace-delimited text by `read_xyz`.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file.
+    mmap_mode : str, optional
+        Memory-mapping mode, see `numpy.memmap`. If None, the binary
+        files are read into memory.
+
+    Returns
+    -------
+    numpy.ndarray or dict
+        A single array for `.npy` and text files, and a dictionary of
+        arrays keyed by name for `.npz` and `.ply` files.
+    """
+    ext = _ext(fname)
+    if ext == '.npy':
+        return np.load(fname, mmap_mode=mmap_mode)
+    elif ext == '.npz':
+        return load_npz(fname, mmap_mode)
+    elif ext == '.ply':
+        return read_ply(fname, mmap_mode)
+    return read_xyz(fname)
+
+
+def save(fname, arr=None, **arrays):
+    """Store a point cloud, normals, power density or a triangle mesh
+    depending on the file extension, see `load`.
+
+    Parameters
+    ----------
+    fname : str
+        Path to the file.
+    arr : numpy.ndarray, optional
+        Array stored in `.npy` and text files.
+    arrays : dict, optional
+        Arrays stored in `.npz` archives, keyed by name, or in `.ply`
+        files, keyed by `points`, `normals`, `power_density` and
+        `triangles`.
+    """
+    ext = _ext(fname)
+    if ext in ('.npz', '.ply'):
+        if arr is not None:
+            raise ValueError(f'Arrays must be named for `{ext}` files')
+        if ext == '.npz':
+            save_npz(fname, **arrays)
+        else:
+            write_ply(fname, **arrays)
+    elif arrays:
+        raise ValueError(f'Only a single array is stored in `{ext}` files')
+    elif ext == '.npy':
+        np.save(fname, arr)
+    else:
+        write_xyz(fname, arr)
+
+
+def convert(src, dst, **extra):
+    """Convert a point cloud or a triangle mesh between the formats
+    supported by `load` and `save`, e.g., a legacy `.xyz` file with
+    the corresponding `.normals` file into a binary `.ply` file.
+
+    Parameters
+    ----------
+    src : str
+        Path to the source file. Text files with 3 columns hold the
+        points and those with 6 columns the points and normals.
+    dst : str
+        Path to the destination file.
+    extra : dict, optional
+        Paths to additional single-array files keyed by name, e.g.,
+        `normals='head.normals'`, or the arrays themselves.
+    """
+    data = load(src)
+    if isinstance(data, np.ndarray):
+        if _ext(src) == '.npy' or data.shape[1] != 6:
+            data = {'points': data}
+        else:
+            data = {'points': data[:, :3], 'normals': data[:, 3:]}
+    else:
+        data = dict(data)
+    for name, value in extra.items():
+        data[name] = load(value) if isinstance(value, str) else value
+    if _ext(dst) in ('.npz', '.ply'):
+        save(dst, **data)
+    elif len(data) == 1:
+        save(dst, next(iter(data.values())))
+    else:
+        save(dst, np.concatenate([np.reshape(a, (a.shape[0], -1))
+                                  for a in data.values()], axis=1))
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='python -m pspd.io',
+        description='Convert point clouds and triangle meshes.',
+    )
+    parser.add_argument('src', help='source file')
+    parser.add_argument('dst', help='destination file')
+    parser.add_argument('--normals', help='file with the normals')
+    parser.add_argument('--power-density',
+                        help='file with the power density')
+    args = parser.parse_args(argv)
+    extra = {name: path for name, path in [('normals', args.normals),
+                                          ('power_density',
+                                           args.power_density)] if path}
+    convert(args.src, args.dst, **extra)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
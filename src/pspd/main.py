@@ -1,27 +1,56 @@
 import datetime
-import sys
+import heapq
+import itertools
 import logging
-logging.basicConfig(stream=sys.stdout, level=logging.INFO)
+import os
 import time
 
 import numpy as np
-try:
-    import open3d as o3d
-except ModuleNotFoundError as e:
-    print(e, 'install it before proceeding', sep=', ')
-else:
-	o3d.utility.set_verbosity_level(o3d.utility.VerbosityLevel(0))
+from scipy import sparse
 from scipy import spatial
-from tqdm.auto import tqdm
 
+from .cache import GeometryCache
+from .mesh import KEYS as MESH_KEYS
+from .mesh import MeshIndex
+from .points import region_of_interest
 from .points import remove_hidden_points
+from .points import voxel_downsample
 from .normals import estimate_normals
+from .misc import clip_polygons
+from .misc import clipped_areas
+from .misc import delaunay_weights
 from .misc import edblquad
+from .misc import spline_degree
+from .parallel import map_batches
+from .results import Results
+from .stats import Stats
+
+
+def _open3d():
+    # open3d takes seconds to import, so it is imported only once a
+    # mesh is actually used
+    import open3d as o3d
+    o3d.utility.set_verbosity_level(o3d.utility.VerbosityLevel(0))
+    return o3d
+
+
+def _tqdm(*args, **kwargs):
+    from tqdm.auto import tqdm
+    return tqdm(*args, **kwargs)
 
 
 class PSPD(object):
     """Automatic detection of the peak spatial power density."""
-    def __init__(self, points, power_density, normals=None, mesh=None):
+    def __init__(self,
+                 points,
+                 power_density,
+                 normals=None,
+                 mesh=None,
+                 mesh_area='exact',
+                 cache=None,
+                 orient='open3d',
+                 dtype=np.float64,
+                 stats=False):
         """Constructor.
         
         Parameters
@@ -34,6 +63,11 @@ class PSPD(object):
             an array of shape (N, ). Otherwise, the shape should
             correspond to the shape of points where columns represent
             x-, y- and z-component of the (complex) power density.
+            Several distributions, e.g., of a frequency sweep, may be
+            stacked in an array of shape (F, N) or (F, N, 3), possibly
+            memory-mapped, where F is the number of fields. Ball
+            neighbourhoods, local bases and bounding boxes are then
+            computed once and all fields are integrated together.
         normals : numpy.ndarray, optional
             Normals of shape (N, 3), where N is the number of points in
             the point cloud. If mesh is not provided, normals should
@@ -43,9 +77,60 @@ class PSPD(object):
             Triangle mesh contains vertices and triangles represented
             by the indices to the vertices. Optionally, it also
             contains triangle and vertex normals and vertex colors.
+        mesh_area : str, optional
+            Surface area estimation if mesh is provided. If `exact`,
+            the triangles that may intersect the ball neighbourhood,
+            found by their centroids, are transformed into the local
+            basis and clipped to the bounding box, and the areas
+            of the clipped triangles are summed up. If `approximate`,
+            the triangles entirely within the ball neighbourhood are
+            subdivided by the midpoint rule and only the subdivided
+            triangles whose vertices are all within the bounding box
+            are kept. In both cases, the triangles are looked up in
+            the mesh index built once in `find`, see
+            `pspd.mesh.MeshIndex`, and the evaluation surface in the
+            results is the triangle mesh of the clipped or the kept
+            triangles, respectively.
+        cache : str, optional
+            Directory in which estimated normals, visible points, ball
+            neighbourhoods, local bases, mesh-derived neighbourhoods
+            and the mesh index are stored, keyed by a hash of the
+            geometry and parameters, and from which they are
+            memory-mapped in later runs, see `pspd.cache.GeometryCache`.
+        orient : str, optional
+            Method for the consistent orientation of the normals if
+            they are estimated, `open3d`, `mst` or `radial`, see
+            `pspd.normals.orient_normals`. The `mst` method does not
+            require open3d and is faster, and `radial` is the fastest
+            but valid only for star-shaped bodies.
+        dtype : numpy.dtype, optional
+            Floating-point type in which the points, normals and power
+            density are stored, e.g., `numpy.float32` to halve their
+            memory footprint. Local bases, centroids and quadrature
+            sums are always computed in double precision.
+        stats : bool, optional
+            If true, the time spent in each stage of the normal
+            estimation and the search, neighbourhood sizes and failed
+            spline fits are collected in `stats`, see
+            `pspd.stats.Stats`, which may be exported in JSON or
+            Prometheus text format. It may also be enabled later by
+            setting `stats.enabled`.
         """
         # add logger
-        self.log = logging.getLogger()
+        self.log = logging.getLogger(__package__)
+
+        # opt-in instrumentation of the hot paths
+        self.stats = Stats(stats)
+
+        # persistent geometry cache - optional
+        if cache is None:
+            self.cache = None
+        else:
+            self.cache = GeometryCache(cache)
+        self._frames = None
+        self.mesh_index = None
+        self.orient = orient
+        self.dtype = np.dtype(dtype)
 
         # handle points
         size = points.shape[0]
@@ -53,10 +138,15 @@ class PSPD(object):
             raise ValueError('Number of points must be > 10')
         else:
             self.size = size
-        self.points = points
+        self.points = np.asanyarray(points, dtype=self.dtype)
         
         # handle mesh - optional
-        if isinstance(mesh, o3d.geometry.TriangleMesh):
+        if mesh_area not in ('exact', 'approximate'):
+            raise ValueError('Unrecognized surface area estimation')
+        self.mesh_area = mesh_area
+        if (mesh is not None) and isinstance(
+            mesh, _open3d().geometry.TriangleMesh
+        ):
             self.mesh = mesh
         else:
             self.log.info('Unrecognized mesh; proceeding without it...')
@@ -68,53 +158,59 @@ class PSPD(object):
             self.log.info(f'Estimating normals with k-nn = {k}...')
             self.log.info(f'Execution started at {datetime.datetime.now()}')
             start_time = time.perf_counter()
-            normals = estimate_normals(points,
-                                       k,
-                                       unit=False,
-                                       orient=True)
+            normals = self._estimate_normals(k)
             elapsed = time.perf_counter() - start_time
             self.log.info(f'Execution finished at {datetime.datetime.now()}')
             self.log.info(f'Elapsed time: {elapsed:.4f} s')
+        if normals is not None:
+            normals = np.asarray(normals, dtype=self.dtype)
         self.normals = normals * -1  # inward orientation
 
-        # handle absorbed or incident power density on the surface
-        assert power_density.shape[0] == self.size, 'Size missmatch'
+        # handle absorbed or incident power density on the surface, a
+        # single field or several fields stacked along the first axis
+        if (power_density.ndim == 3) or (
+            (power_density.ndim == 2) and (power_density.shape[0] != size)
+        ):
+            assert power_density.shape[1] == self.size, 'Size missmatch'
+            self.n_fields = power_density.shape[0]
+        else:
+            assert power_density.shape[0] == self.size, 'Size missmatch'
+            self.n_fields = None
         if power_density.ndim == 1:  # surface-normal propagation-direction
             self.power_density_n = power_density
-        elif power_density.ndim == 2:  # unoriented
-            if power_density.shape[1] == 3:
+        elif self.n_fields and (power_density.ndim == 2):
+            # one point per row, a view of a memory-mapped stack
+            self.power_density_n = power_density.T
+        elif power_density.ndim in (2, 3):  # unoriented
+            if power_density.shape[-1] == 3:
                 if self.normals is None:
                     k = self._k
                     self.log.info(f'Estimating normals with k-nn = {k}...')
                     self.log.info(f'Execution started at {datetime.datetime.now()}')
                     start_time = time.perf_counter()
-                    normals = estimate_normals(points,
-                                               k,
-                                               unit=False,
-                                               orient=True)
+                    normals = self._estimate_normals(k)
                     elapsed = time.perf_counter() - start_time
                     self.log.info(f'Execution finished at {datetime.datetime.now()}')
                     self.log.info(f'Elapsed time: {elapsed:.4f} s')
-                    self.normals = normals * -1  # inward orientation
-                self.power_density_n = np.sum(
-                    np.real(power_density) * self.normals,
-                    axis=1,
-                )
-            elif power_density.shape[2] == 1:
-                self.power_density_n = np.ravel(power_density)
+                    self.normals = np.asarray(normals, dtype=self.dtype) * -1
+                if self.n_fields:
+                    self.power_density_n = self._project(power_density)
+                else:
+                    self.power_density_n = np.sum(
+                        np.real(power_density) * self.normals,
+                        axis=1,
+                    )
+            elif power_density.shape[-1] == 1:
+                self.power_density_n = np.squeeze(power_density, -1).T
             else:
                 raise ValueError('Unrecognized data distribution')
         else:
-            raise ValueError('Only 1- and 2-D data supported')
+            raise ValueError('Only 1-, 2- and 3-D data supported')
+        self.power_density_n = np.asanyarray(self.power_density_n,
+                                             dtype=self.dtype)
         
-        # dictionary for the results
-        self.results = {'query point': [], 
-                        'k-neighbourhood': [],
-                        'k-neighbourhood normals': [],
-                        'evaluation surface': [],
-                        'surface area': [],
-                        'power density': [],
-                        'spatially averaged power density': []}
+        # compact, dictionary-like store for the results
+        self.results = Results(self, capacity=0)
     
     def __str__(self):
         return f'Spatial domain with {self.size} points'
@@ -122,6 +218,17 @@ class PSPD(object):
     def __repr__(self):
         return self.__str__()
     
+    def _project(self, power_density, chunk_size=65536):
+        # normal components of stacked fields, chunk by chunk so that a
+        # memory-mapped stack is never loaded at once
+        out = np.empty((self.size, self.n_fields), dtype=self.dtype)
+        for i in range(0, self.size, chunk_size):
+            sl = slice(i, i + chunk_size)
+            out[sl] = np.einsum('fnk,nk->nf',
+                                np.real(power_density[:, sl]),
+                                self.normals[sl])
+        return out
+
     @property
     def _k(self):
         k = int(2 * np.log(self.size))
@@ -131,6 +238,18 @@ class PSPD(object):
             k = 30
         return k
 
+    def _estimate_normals(self, k):
+        if self.cache is None:
+            return estimate_normals(self.points, k, unit=False,
+                                    orient=self.orient, stats=self.stats)
+        key = self.cache.key(self.points, k=k, unit=False, orient=self.orient)
+        return self.cache.get(
+            key,
+            ['normals'],
+            lambda: estimate_normals(self.points, k, unit=False,
+                                     orient=self.orient, stats=self.stats),
+        )['normals']
+
     @property
     def _query_ball_radius(self):
         try:
@@ -148,126 +267,856 @@ class PSPD(object):
             return X @ mapper, mapper
         return X @ mapper
     
-    def _bound_nbh(self, nbh, p):
-        try:
-            a = np.sqrt(self.projected_area)
-        except AttributeError as e:
-            print(e, 'projected area is not defined', sep=', ')
-            return
-        else:
-            bbox = [p[0]-a/2, p[0]+a/2,
-                    p[1]-a/2, p[1]+a/2]
-            bbox_ind = np.where(
-                (nbh[:, 0] >= bbox[0]) & (nbh[:, 0] <= bbox[1])
-                & (nbh[:, 1] >= bbox[2]) & (nbh[:, 1] <= bbox[3])
-            )[0]
-            return bbox, bbox_ind
-    
-    def _bound_mesh(self, nbh_vert, bbox):
-        bbox_ind = np.where(
-            (nbh_vert[:, 0] >= bbox[0]) & (nbh_vert[:, 0] <= bbox[1])
-            & (nbh_vert[:, 1] >= bbox[2]) & (nbh_vert[:, 1] <= bbox[3])
-        )[0]
-        return bbox_ind
-
-    def _estimate_surf_area(self, domain):
+    def _bound_mesh(self, nbht_vert, bbox):
+        return ((nbht_vert[..., 0] >= bbox[..., 0:1])
+                & (nbht_vert[..., 0] <= bbox[..., 1:2])
+                & (nbht_vert[..., 1] >= bbox[..., 2:3])
+                & (nbht_vert[..., 1] <= bbox[..., 3:4]))
+
+    def _estimate_surf_area(self, domain, bbox):
         if isinstance(domain, np.ndarray):
-            area = edblquad(domain[:, :2],
-            				np.linalg.norm(domain[:, 2:], axis=1))
-        elif isinstance(domain, o3d.geometry.TriangleMesh):
+            area = self._fit_spline(domain[:, :2],
+                                    np.linalg.norm(domain[:, 2:], axis=1))
+        elif isinstance(domain, _open3d().geometry.TriangleMesh):
             area = domain.get_surface_area()
         else:
             print(NotImplementedError('Proceeding with the projected area'))
             area = self.projected_area
         return area
 
+    def _fit_spline(self, points, values, bbox=None, **kwargs):
+        # splines of a lowered default degree, see `edblquad`
+        if ('kx' not in kwargs) and (spline_degree(points.shape[0]) < 3):
+            self.stats.count('spline_degree_lowered')
+        # failed fits are counted before the error is raised
+        try:
+            integral, caught = edblquad(points, values, bbox=bbox,
+                                        full_output=True, **kwargs)
+        except ValueError:
+            self.stats.count('spline_fit_errors')
+            raise
+        self.stats.count('spline_fit_warnings', caught)
+        return integral
 
-    def _step(self, p, rc):
-        ind = self.tree.query_ball_point([p], rc)[0]
-        nbh = self.points[ind]
-        n = self.normals[ind]
-        pdn = self.power_density_n[ind]
-        if self.mesh:
-            vind = self.vtree.query_ball_point([p], rc)[0]
-            nbh_mesh = self.mesh.select_by_index(vind, cleanup=True)
-            nbh_mesh = nbh_mesh.subdivide_midpoint(number_of_iterations=1)
-            nbh_vert = np.asarray(nbh_mesh.vertices)
-        else:  # use surface normals for surface area estimation
-            pass
-        
-        # point cloud in the orthonormal basis
-        mu = np.mean(nbh, axis=0)
-        nbht, mapper = self._map(nbh - mu)
-        pt = self._map(p - mu, mapper)
+    def _build_mesh_index(self):
+        tri = np.asarray(self.mesh.triangles)
+        subdivide = self.mesh_area == 'approximate'
+        if self.cache is None:
+            return MeshIndex.from_mesh(self.vert, tri, subdivide)
+        key = self.cache.key(self.vert, tri, subdivide=subdivide)
+        return MeshIndex(self.cache.get(
+            key,
+            list(MESH_KEYS),
+            lambda: list(MeshIndex.from_mesh(self.vert,
+                                             tri,
+                                             subdivide).arrays.values()),
+        ))
 
-        # bounding box that corresponds to the projected surface
-        bbox, nbh_bbox_ind = self._bound_nbh(nbht, pt)
-        if self.mesh:
-            nbht_vert = self._map(nbh_vert - mu, mapper)
-            vert_bbox_ind = self._bound_mesh(nbht_vert, bbox)
-            domain = nbh_mesh.select_by_index(vert_bbox_ind, cleanup=True)
+    def _approximate_mesh_children(self, seg, tind, count):
+        # triangles entirely within the ball, subdivided once
+        keep = count == 3
+        child = (4 * tind[keep, np.newaxis] + np.arange(4)).ravel()
+        return np.repeat(seg[keep], 4), child
+
+    def _mesh_ball(self, P, rc):
+        # triangles that may cross the ball, to be clipped for the exact
+        # surface area, otherwise vertices within the ball
+        if self.mesh_area == 'exact':
+            return self.mesh_index.near_triangles(P, rc)
+        return self.vtree.query_ball_point(P, rc, return_sorted=False)
+
+    def _mesh_area_batch(self, vind, mu, mapper, bbox):
+        # one vectorized pass over the triangles of the whole batch
+        mi = self.mesh_index
+        if self.mesh_area == 'exact':
+            size = np.fromiter(map(len, vind), dtype=int, count=len(vind))
+            seg = np.repeat(np.arange(size.size), size)
+            tind = np.fromiter(itertools.chain.from_iterable(vind),
+                               dtype=np.intp, count=size.sum())
+            V = (mi.vertices[mi.triangles[tind]]
+                 - mu[seg, np.newaxis]) @ mapper[seg]
+            areas = [np.bincount(seg, clipped_areas(V, bb[seg]),
+                                 minlength=len(vind))
+                     for bb in bbox]
+        else:
+            seg, tind, count = mi.ball_triangles(vind)
+            seg, child = self._approximate_mesh_children(seg, tind, count)
+            V = (mi.sub_vertices[mi.sub_triangles[child]]
+                 - mu[seg, np.newaxis]) @ mapper[seg, :, :2]
+            areas = []
+            for bb in bbox:
+                inside = np.all(self._bound_mesh(V, bb[seg]), axis=1)
+                areas.append(np.bincount(seg[inside],
+                                         mi.sub_areas[child[inside]],
+                                         minlength=len(vind)))
+        empty = sum(np.count_nonzero(a <= 0) for a in areas)
+        if empty:
+            self.stats.count('empty_surfaces', empty)
+            self.log.warning(f'{empty} bounding boxes do not cover any '
+                             'triangle of the mesh, their spatial average '
+                             'is undefined')
+        return areas
+
+    def _domain(self, nbht, n, bbox, mu, mapper, vind):
+        if self.mesh and (self.mesh_area == 'exact'):
+            # triangles around the query point clipped to the bounding
+            # box in the local basis, and fanned around the first vertex
+            # of the clipped polygons
+            mi = self.mesh_index
+            tind = np.asarray(vind, dtype=np.intp)
+            poly, count = clip_polygons(
+                self._map(mi.vertices[mi.triangles[tind]] - mu, mapper),
+                np.asarray(bbox)
+            )
+            m = poly.shape[1]
+            k = np.arange(1, m - 1)
+            first = np.arange(poly.shape[0])[:, np.newaxis] * m
+            tri = np.stack(np.broadcast_arrays(first, first + k,
+                                               first + k + 1), axis=-1)
+            tri = tri[k + 1 < count[:, np.newaxis]]
+            o3d = _open3d()
+            domain = o3d.geometry.TriangleMesh(
+                o3d.utility.Vector3dVector(poly.reshape(-1, 3) @ mapper.T
+                                           + mu),
+                o3d.utility.Vector3iVector(tri.astype(np.int32)),
+            )
+            domain.remove_duplicated_vertices()
+            domain.remove_unreferenced_vertices()
+        elif self.mesh:
+            # subdivided triangles within the bounding box
+            mi = self.mesh_index
+            _, child = self._approximate_mesh_children(
+                *mi.ball_triangles([vind])
+            )
+            tri = mi.sub_triangles[child]
+            nbht_vert = self._map(mi.sub_vertices[tri] - mu, mapper)
+            inside = np.all(self._bound_mesh(nbht_vert, np.asarray(bbox)),
+                            axis=1)
+            o3d = _open3d()
+            domain = o3d.geometry.TriangleMesh(
+                o3d.utility.Vector3dVector(mi.sub_vertices),
+                o3d.utility.Vector3iVector(tri[inside].astype(np.int32)),
+            )
+            domain.remove_unreferenced_vertices()
         else:  # if mesh is not provided, domain is the local point cloud
-            domain = nbht[nbh_bbox_ind, :2]
-            domain = np.c_[domain, n[nbh_bbox_ind]]  # append surface normals
-        
-        # conformal surface area
-        area = self._estimate_surf_area(domain)
+            domain = nbht[:, :2]
+            domain = np.c_[domain, n]  # append surface normals
+        return domain
+
+    def _integrate(self, nbht, n, pdn, bbox, bbox_ind, mu, mapper, vind,
+                   area=None):
+        if self.engine != 'spline':
+            # linear engines clip the integrand to the bounding box, so
+            # the whole ball neighbourhood is integrated at once for
+            # the power density and, if needed, the surface area
+            if area is None:
+                values = np.c_[pdn, np.linalg.norm(n, axis=1)]
+            else:
+                values = pdn.reshape(pdn.shape[0], -1)
+            with self.stats.time('quadrature'):
+                integral = edblquad(nbht[:, :2], values, bbox=bbox,
+                                    engine=self.engine)
+                if (area is None) and (integral[-1] <= 0):
+                    # only `rbf` has negative weights, fall back to the
+                    # non-negative piecewise-linear ones
+                    self.stats.count('quadrature_fallbacks')
+                    integral = edblquad(nbht[:, :2], values, bbox=bbox,
+                                        engine='delaunay')
+            if area is None:
+                area, integral = integral[-1], integral[:-1]
+            if pdn.ndim == 1:  # single field
+                integral = integral[0]
+            return area, None, integral / area
+        if area is None:
+            domain = self._domain(nbht[bbox_ind], n[bbox_ind], bbox, mu,
+                                  mapper, vind)
+
+            # conformal surface area
+            with self.stats.time('area'):
+                area = self._estimate_surf_area(domain, bbox)
+        else:  # already estimated for the whole batch
+            domain = None
         
         # spatially averaged absorbed power density
-        spdn = 1 / area * edblquad(points=nbht[nbh_bbox_ind, :2],
-                                   values=pdn[nbh_bbox_ind],
-                                   bbox=bbox,
-                                   s=1)
-        return nbh[nbh_bbox_ind], n[nbh_bbox_ind], area, domain, pdn[nbh_bbox_ind], spdn
-            
-    def find(self, projected_area, **kwargs):
+        with self.stats.time('spline_fit'):
+            spdn = 1 / area * self._fit_spline(nbht[bbox_ind, :2],
+                                               pdn[bbox_ind],
+                                               bbox=bbox,
+                                               s=1)
+        return area, domain, spdn
+
+    def _ball(self, idx, rc):
+        if self._frames is not None:  # gather from the geometry cache
+            with self.stats.time('ball_query'):
+                f = self._frames
+                start = f['ball_indptr'][idx]
+                size = f['ball_indptr'][idx+1] - start
+                ptr = np.r_[0, np.cumsum(size)]
+                flat = f['ball_indices'][np.repeat(start - ptr[:-1], size)
+                                         + np.arange(ptr[-1])].astype(np.intp)
+                if self.mesh:
+                    kind = self._mesh_ball_kind
+                    vptr = f[f'{kind}_indptr']
+                    vind = [f[f'{kind}_indices'][vptr[i]:vptr[i+1]].tolist()
+                            for i in idx]
+                else:
+                    vind = [None] * idx.size
+                mu, mapper = f['mu'][idx], f['mapper'][idx]
+            self.stats.observe('ball_size', size)
+            return flat, ptr, mu, mapper, vind
+
+        # one ball query for the whole chunk of query points
+        with self.stats.time('ball_query'):
+            P = self.points_visible[idx]
+            ind = self.tree.query_ball_point(P, rc, return_sorted=False)
+            size = np.fromiter(map(len, ind), dtype=int, count=len(ind))
+            if self.mesh:
+                vind = self._mesh_ball(P, rc)
+            else:  # use surface normals for surface area estimation
+                vind = [None] * len(ind)
+
+            # neighbourhoods concatenated into a single array, CSR-like
+            ptr = np.r_[0, np.cumsum(size)]
+            flat = np.fromiter(itertools.chain.from_iterable(ind),
+                               dtype=np.intp, count=ptr[-1])
+        self.stats.observe('ball_size', size)
+
+        # local orthonormal bases from stacked covariance matrices
+        with self.stats.time('pca'):
+            seg = np.repeat(np.arange(size.size), size)
+            nbh = self.points[flat]
+            mu = np.add.reduceat(nbh, ptr[:-1], axis=0,
+                                 dtype=np.float64) / size[:, np.newaxis]
+            X = nbh - mu[seg]
+            iu = np.triu_indices(3)
+            C = np.empty((size.size, 3, 3))
+            C[:, iu[0], iu[1]] = np.add.reduceat(X[:, iu[0]] * X[:, iu[1]],
+                                                 ptr[:-1], axis=0)
+            C[:, iu[1], iu[0]] = C[:, iu[0], iu[1]]
+            mapper, _, _ = np.linalg.svd(C)
+        return flat, ptr, mu, mapper, vind
+
+    def _ball_all(self, rc, batch_size):
+        size = self.points_visible.shape[0]
+        if self.size < np.iinfo(np.int32).max:
+            itype = np.int32
+        else:
+            itype = np.int64
+        flat, ptr, mu, mapper, vind = zip(*(
+            self._ball(np.arange(i, min(i + batch_size, size)), rc)
+            for i in range(0, size, batch_size)
+        ))
+        sizes = np.concatenate([np.diff(p) for p in ptr])
+        out = [np.concatenate(flat).astype(itype),
+               np.r_[0, np.cumsum(sizes)],
+               np.concatenate(mu),
+               np.concatenate(mapper)]
+        if self.mesh:
+            vind = list(itertools.chain.from_iterable(vind))
+            vsize = np.fromiter(map(len, vind), dtype=int, count=len(vind))
+            out += [np.fromiter(itertools.chain.from_iterable(vind),
+                                dtype=itype, count=vsize.sum()),
+                    np.r_[0, np.cumsum(vsize)]]
+        return out
+
+    @property
+    def _mesh_ball_kind(self):
+        return 'triangle' if self.mesh_area == 'exact' else 'vertex'
+
+    def _cached_frames(self, rc, batch_size):
+        arrays = [self.points, self.points_visible]
+        names = ['ball_indices', 'ball_indptr', 'mu', 'mapper']
+        if self.mesh:
+            kind = self._mesh_ball_kind
+            arrays += [self.vert, self.mesh_index.triangles]
+            names += [f'{kind}_indices', f'{kind}_indptr']
+        key = self.cache.key(*arrays, radius=rc, mesh_area=self.mesh_area)
+        return self.cache.get(key,
+                              names,
+                              lambda: self._ball_all(rc, batch_size))
+
+    def _frames_batch(self, idx, rc):
+        flat, ptr, mu, mapper, vind = self._ball(idx, rc)
+        with self.stats.time('pca'):  # projection onto the local bases
+            P = self.points_visible[idx]
+            size = np.diff(ptr)
+            seg = np.repeat(np.arange(size.size), size)
+            X = self.points[flat] - mu[seg]
+            nbht = np.einsum('mi,mij->mj', X, mapper[seg, :, :2])
+            pt = np.einsum('bi,bij->bj', P - mu, mapper[:, :, :2])
+
+        # bounding boxes that correspond to the projected surface, one
+        # for each projected area sharing the neighbourhood and its basis
+        bbox = []
+        inside = []
+        with self.stats.time('bbox'):
+            for a in np.sqrt(self.areas):
+                bb = np.c_[pt[:, 0] - a/2, pt[:, 0] + a/2,
+                           pt[:, 1] - a/2, pt[:, 1] + a/2]
+                bbox.append(bb)
+                inside.append((nbht[:, 0] >= bb[seg, 0])
+                              & (nbht[:, 0] <= bb[seg, 1])
+                              & (nbht[:, 1] >= bb[seg, 2])
+                              & (nbht[:, 1] <= bb[seg, 3]))
+        if self.stats.enabled:
+            for ins in inside:
+                self.stats.observe('bbox_size',
+                                   np.add.reduceat(ins, ptr[:-1]))
+        return flat, ptr, nbht, mu, mapper, bbox, inside, vind
+
+    def _step_batch(self, idx, rc):
+        flat, ptr, nbht, mu, mapper, bbox, inside, vind = self._frames_batch(
+            idx, rc
+        )
+        n = self.normals[flat]
+        pdn = self.power_density_n[flat]
+        self.stats.count('query_points', idx.size)
+        if self.mesh:
+            with self.stats.time('area'):
+                areas = self._mesh_area_batch(vind, mu, mapper, bbox)
+        else:
+            areas = [[None] * idx.size] * len(bbox)
+
+        # integration remains per neighbourhood and per projected area
+        for b in range(idx.size):
+            sl = slice(ptr[b], ptr[b+1])
+            recs = []
+            for bb, ins, ar in zip(bbox, inside, areas):
+                bbox_ind = np.where(ins[sl])[0]
+                area, _, spdn = self._integrate(nbht[sl], n[sl], pdn[sl],
+                                                list(bb[b]), bbox_ind,
+                                                mu[b], mapper[b], vind[b],
+                                                ar[b])
+                recs.append((flat[sl][bbox_ind], area, spdn, mu[b],
+                             mapper[b], bb[b]))
+            yield recs
+
+    def _weights_batch(self, idx, rc):
+        flat, ptr, nbht, mu, mapper, bbox, inside, vind = self._frames_batch(
+            idx, rc
+        )
+        n = self.normals[flat]
+        if self.mesh:
+            area = self._mesh_area_batch(vind, mu, mapper, bbox[:1])[0]
+        else:
+            area = np.empty(idx.size)
+        bbox, inside = bbox[0], inside[0]
+        for b in range(idx.size):
+            sl = slice(ptr[b], ptr[b+1])
+            if not self.mesh:  # use surface normals for surface area
+                bbox_ind = np.where(inside[sl])[0]
+                domain = self._domain(nbht[sl][bbox_ind], n[sl][bbox_ind],
+                                      list(bbox[b]), mu[b], mapper[b],
+                                      vind[b])
+                area[b] = self._estimate_surf_area(domain, list(bbox[b]))
+            w = delaunay_weights(nbht[sl], bbox=list(bbox[b]))
+            nz = np.where(w != 0)[0]
+            yield flat[sl][nz], w[nz] / area[b]
+
+    def _ball_max(self, P, rc, batch_size):
+        # with non-negative weights, the spatial average is a convex
+        # combination of the power density divided by the norm of the
+        # normals, whose maximum within the ball bounds it from above
+        bound = np.empty(P.shape[0])
+        for i in range(0, P.shape[0], batch_size):
+            if self._frames is not None:
+                ptr = self._frames['ball_indptr'][i:i+batch_size+1]
+                flat = self._frames['ball_indices'][ptr[0]:ptr[-1]]
+                ptr = ptr - ptr[0]
+            else:
+                ind = self.tree.query_ball_point(P[i:i+batch_size], rc,
+                                                 return_sorted=False)
+                size = np.fromiter(map(len, ind), dtype=int, count=len(ind))
+                ptr = np.r_[0, np.cumsum(size)]
+                flat = np.fromiter(itertools.chain.from_iterable(ind),
+                                   dtype=np.intp, count=ptr[-1])
+            bound[i:i+batch_size] = np.maximum.reduceat(
+                self.power_density_n[flat]
+                / np.linalg.norm(self.normals[flat], axis=1),
+                ptr[:-1]
+            )
+        return bound
+
+    def _setup(self,
+               projected_area,
+               batch_size,
+               engine='spline',
+               roi=None,
+               **kwargs):
+        if engine not in ('spline', 'delaunay', 'voronoi', 'rbf'):
+            raise ValueError('Unrecognized integration engine')
+        self.engine = engine
+        if np.iterable(projected_area):
+            self.areas = tuple(projected_area)
+        else:
+            self.areas = (projected_area, )
+        self.projected_area = max(self.areas)
+        with self.stats.time('kdtree'):
+            self.tree = spatial.KDTree(self.points)
+        if self.mesh:
+            self.vert = np.asarray(self.mesh.vertices)
+            self.vtree = spatial.KDTree(self.vert)
+            if self.mesh_index is None:  # built once for the mesh
+                with self.stats.time('mesh_index'):
+                    self.mesh_index = self._build_mesh_index()
+        if kwargs:  # if exists, iterate only over "visible" set of points
+            with self.stats.time('hidden_points'):
+                if self.cache is None:
+                    self.ind = remove_hidden_points(self.points, **kwargs)
+                else:
+                    key = self.cache.key(self.points, **kwargs)
+                    self.ind = self.cache.get(
+                        key,
+                        ['visible'],
+                        lambda: remove_hidden_points(self.points, **kwargs),
+                    )['visible']
+        else:
+            self.ind = ...
+        self.query_ind = np.arange(self.size)[self.ind]
+        if roi is not None:  # region of interest resolved once for all
+            if isinstance(roi, dict):
+                values = self.power_density_n
+                if self.n_fields:  # relative to the maximum of each field
+                    values = np.max(values / np.max(values, axis=0), axis=1)
+                roi = region_of_interest(self.points, values=values, **roi)
+            else:
+                roi = region_of_interest(self.points, mask=roi)
+            self.query_ind = self.query_ind[roi[self.query_ind]]
+            self.ind = self.query_ind
+        self.points_visible = self.points[self.query_ind]
+        self._query_tree = None  # built on the first update
+        rc = self._query_ball_radius
+        self._frames = None
+        if self.cache is not None:
+            self._frames = self._cached_frames(rc, batch_size)
+        return rc
+
+    def _iter_batches(self, rc, batch_size, n_jobs):
+        size = self.points_visible.shape[0]
+        if n_jobs > 1:
+            batches = map_batches(self, batch_size, n_jobs)
+        else:
+            batches = (self._step_batch(np.arange(i, min(i + batch_size,
+                                                         size)),
+                                        rc)
+                       for i in range(0, size, batch_size))
+        for i, out in zip(range(0, size, batch_size), batches):
+            yield self.query_ind[i:i+batch_size], out
+
+    def _find_exhaustive(self, results, rc, batch_size, n_jobs):
+        with _tqdm(total=self.points_visible.shape[0]) as pbar:
+            for idx, out in self._iter_batches(rc, batch_size, n_jobs):
+                for j, recs in zip(idx, out):
+                    for res, rec in zip(results, recs):
+                        res.append(j, *rec)
+                pbar.update(idx.size)
+
+    def _find_peak(self, results, rc, batch_size, top_k):
+        P = self.points_visible
+        bound = self._ball_max(P, rc, batch_size)
+        order = np.argsort(-bound, kind='stable')
+        if order.size == 0:
+            return
+        best = []  # min-heap of the top-k spatially averaged values
+        with _tqdm(total=order.size) as pbar:
+            for i in range(0, order.size, batch_size):
+                cand = order[i:i+batch_size]
+                if len(best) == top_k:  # prune what cannot enter the top-k
+                    cand = cand[bound[cand] > best[0][0]]
+                    if cand.size == 0:
+                        pbar.update(order.size - i)
+                        break
+                for j, (rec, ) in zip(cand, self._step_batch(cand, rc)):
+                    if len(best) < top_k:
+                        heapq.heappush(best, (rec[2], j, rec))
+                    elif rec[2] > best[0][0]:
+                        heapq.heapreplace(best, (rec[2], j, rec))
+                pbar.update(cand.size)
+        self.log.info(f'Evaluated {i + cand.size} out of {order.size} '
+                      'query points')
+        for _, j, rec in sorted(best, reverse=True):
+            results[0].append(self.query_ind[j], *rec)
+
+    def _find_hierarchical(self, results, rc, batch_size, levels, refine):
+        P = self.points_visible
+        a = np.sqrt(self.projected_area)
+        voxel_size = [a / 2 ** l for l in range(1, levels + 1)]
+        pyramid = [voxel_downsample(P, v) for v in voxel_size]
+        pyramid.append(np.arange(P.shape[0]))
+        values = np.full(P.shape[0], np.nan)
+        for l, level in enumerate(pyramid):
+            if l == 0:  # evaluate the coarsest level entirely
+                cand = level
+            else:  # refine only around the best-scoring regions
+                evaluated = np.where(~np.isnan(values))[0]
+                best = evaluated[np.argsort(-values[evaluated])[:refine]]
+                r = np.sqrt(3) * voxel_size[l-1]
+                near = spatial.KDTree(P[level]).query_ball_point(P[best], r)
+                cand = level[np.unique(np.concatenate(near).astype(int))]
+                cand = cand[np.isnan(values[cand])]
+            self.log.info(f'Level {l}: evaluating {cand.size} query points')
+            for i in _tqdm(range(0, cand.size, batch_size)):
+                idx = cand[i:i+batch_size]
+                for j, (rec, ) in zip(idx, self._step_batch(idx, rc)):
+                    values[j] = rec[2]
+                    results[0].append(self.query_ind[j], *rec)
+
+    def find(self,
+             projected_area,
+             batch_size=128,
+             n_jobs=1,
+             mode='exhaustive',
+             top_k=1,
+             levels=3,
+             refine=4,
+             engine='spline',
+             roi=None,
+             **kwargs):
         """Finds the peak spatially averaged power density on the
         non-planar surface.
         
         Parameters
         ----------
-        projected_area : float
+        projected_area : float or list
             Area of the square projection of the evaluation surface,
-            units should correspond to units of the point cloud.
+            units should correspond to units of the point cloud. If
+            several areas are given, the ball neighbourhood of each
+            query point and its local basis are computed once for the
+            largest area and reused for all areas. The results are
+            then stored in a dictionary keyed by the projected area.
+        batch_size : int, optional
+            Number of query points whose neighbourhoods, local bases
+            and bounding boxes are computed at once. Only the
+            integration is carried out for each query point separately.
+        n_jobs : int, optional
+            Number of worker processes. If larger than 1, batches of
+            query points are distributed over a process pool with the
+            geometry and the power density placed in shared memory.
+            If -1, all available CPUs are used.
+        mode : str, optional
+            If `exhaustive`, the spatially averaged power density is
+            computed at every point of the search space. If `peak`,
+            only the `top_k` largest values are searched for by using
+            branch-and-bound: the maximum of the power density divided
+            by the norm of the normals within the ball neighbourhood of
+            each query point is its upper bound, query points are
+            visited in the descending order of their bounds and those
+            that cannot exceed the current k-th largest value are
+            skipped. The bound holds only for the non-negative weights
+            of the `delaunay` and `voronoi` engines, which integrate
+            the power density and the surface area alike, so that the
+            mode requires one of them and a point cloud without mesh.
+            The outcome then equals the one of the exhaustive search. If
+            `hierarchical`, the search space is voxel-downsampled into
+            a pyramid whose coarsest voxels are half the edge of the
+            projected area in size. The spatially averaged power
+            density is computed on the coarsest level and then only
+            around the `refine` best query points found so far on
+            each finer level down to the full resolution.
+        top_k : int, optional
+            Number of the largest spatially averaged values kept in
+            the `peak` mode. The results are sorted in descending
+            order.
+        levels : int, optional
+            Number of downsampled levels in the `hierarchical` mode.
+            Voxel size is halved from one level to the next.
+        refine : int, optional
+            Number of the best query points around which the search is
+            refined in the `hierarchical` mode.
+        engine : str, optional
+            Integration engine, see `pspd.misc.edblquad`. The default
+            `spline` fits smoothing bivariate splines to the points
+            within the bounding box. The linear engines integrate the
+            whole ball neighbourhood clipped to the bounding box with
+            quadrature weights shared by the surface area and the power
+            density: `delaunay` integrates the piecewise-linear
+            interpolant over the Delaunay triangulation, `voronoi`
+            weights each point by the area of its Voronoi cell in the
+            local tangent plane and `rbf` fits Gaussian radial basis
+            functions on a fixed grid over the bounding box. Only `rbf`
+            is faster than `spline`, while `delaunay` and `voronoi`
+            triangulate every neighbourhood and are several times
+            slower.
+        roi : numpy.ndarray or dict, optional
+            Region of interest to which the search space is restricted
+            in addition to the hidden point removal. Either a boolean
+            mask of shape (N, ) or indices of the points, or keyword
+            arguments for `pspd.points.region_of_interest`, e.g.,
+            `{'box': (lower, upper)}`, `{'sphere': (center, radius)}`
+            or `{'threshold': 0.1}` to skip the points whose power
+            density is below 10% of the maximum.
         kwargs : dict, optional
             Additional keyword arguments for
             `pspd.points.remove_hidden_points` function to restrict the
             the number of points and subsequently the search space.
         """
-        self.projected_area = projected_area
-        rc = self._query_ball_radius
-        self.tree = spatial.KDTree(self.points)
-        if self.mesh:
-            self.vert = np.asarray(self.mesh.vertices)
-            self.vtree = spatial.KDTree(self.vert)
-        if kwargs:  # if exists, iterate only over "visible" set of points
-            self.ind = remove_hidden_points(self.points, **kwargs)
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+        if mode not in ('exhaustive', 'peak', 'hierarchical'):
+            raise ValueError('Unrecognized search mode')
+        if (mode != 'exhaustive') & (n_jobs > 1):
+            raise ValueError('Parallel execution requires exhaustive mode')
+        if (mode == 'peak') and (engine not in ('delaunay', 'voronoi')):
+            raise ValueError('Peak mode requires `delaunay` or `voronoi` '
+                             'engine')
+        if (mode == 'peak') and self.mesh:
+            raise ValueError('Peak mode requires a point cloud without mesh')
+        rc = self._setup(projected_area, batch_size, engine, roi, **kwargs)
+        if (len(self.areas) > 1) & (mode != 'exhaustive'):
+            raise ValueError('Several projected areas require exhaustive mode')
+        if self.n_fields and (mode != 'exhaustive'):
+            raise ValueError('Several fields require exhaustive mode')
+        results = [Results(self, capacity=self.query_ind.size, radius=rc)
+                   for _ in self.areas]
+        if np.iterable(projected_area):
+            self.results = dict(zip(self.areas, results))
         else:
-            self.ind = ...
-        self.points_visible = self.points[self.ind]
+            self.results = results[0]
+
+        # settings that produced the results, checked by later updates
+        self._search = {'areas': self.areas,
+                        'engine': self.engine,
+                        'radius': rc,
+                        'query_ind': self.query_ind}
         self.log.info(f'Execution started at {datetime.datetime.now()}')
         start_time = time.perf_counter()
-        for p in tqdm(self.points_visible):
-            nbh, n, area, domain, pdn, spdn = self._step(p, rc)
-            self.results['query point'].append(p)
-            self.results['k-neighbourhood'].append(nbh)
-            self.results['k-neighbourhood normals'].append(n)
-            self.results['surface area'].append(area)
-            self.results['evaluation surface'].append(domain)
-            self.results['power density'].append(pdn)
-            self.results['spatially averaged power density'].append(spdn)
+        with self.stats.time('find'):
+            if mode == 'peak':
+                self._find_peak(results, rc, batch_size, top_k)
+            elif mode == 'hierarchical':
+                self._find_hierarchical(results, rc, batch_size, levels,
+                                        refine)
+            else:
+                self._find_exhaustive(results, rc, batch_size, n_jobs)
         elapsed = time.perf_counter() - start_time
         self.log.info(f'Execution finished at {datetime.datetime.now()}')
         self.log.info(f'Elapsed time: {elapsed:.4f} s')
 
-    def get_results(self, peak=True):
+    def iter_find(self,
+                  projected_area,
+                  batch_size=128,
+                  n_jobs=1,
+                  engine='spline',
+                  roi=None,
+                  **kwargs):
+        """Computes the spatially averaged power density at every point
+        of the search space and yields the results as they are produced
+        without storing them in `results`.
+        
+        Parameters
+        ----------
+        projected_area : float or list
+            Area of the square projection of the evaluation surface,
+            units should correspond to units of the point cloud. If
+            several areas are given, see `find`, the results are
+            yielded in a dictionary keyed by the projected area.
+        batch_size : int, optional
+            Number of query points processed and yielded at once.
+        n_jobs : int, optional
+            Number of worker processes, see `find`. The process pool is
+            shut down once the generator is exhausted or closed.
+        engine : str, optional
+            Integration engine, see `find`.
+        roi : numpy.ndarray or dict, optional
+            Region of interest, see `find`.
+        kwargs : dict, optional
+            Additional keyword arguments for
+            `pspd.points.remove_hidden_points` function to restrict the
+            the number of points and subsequently the search space.
+        
+        Yields
+        ------
+        pspd.results.Results or dict
+            Results for a single batch of query points in the order of
+            the search space. Iteration may be stopped at any time,
+            e.g., once a compliance threshold is exceeded.
+        """
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+        rc = self._setup(projected_area, batch_size, engine, roi, **kwargs)
+        for idx, out in self._iter_batches(rc, batch_size, n_jobs):
+            chunk = [Results(self, capacity=idx.size, radius=rc)
+                     for _ in self.areas]
+            for j, recs in zip(idx, out):
+                for res, rec in zip(chunk, recs):
+                    res.append(j, *rec)
+            if np.iterable(projected_area):
+                yield dict(zip(self.areas, chunk))
+            else:
+                yield chunk[0]
+
+    def update_power_density(self, indices, values, batch_size=128):
+        """Updates the power density at a subset of points and
+        recomputes the spatially averaged power density only at the
+        query points whose ball neighbourhood contains any of them,
+        e.g., after the source has been shifted slightly in an
+        iterative placement optimization.
+        
+        The results of the last exhaustive search are updated in place
+        with the search space, the integration engine and the ball
+        radius unchanged, so that the peak returned by `get_results`
+        reflects the new power density. A region of interest given by
+        a threshold is not re-evaluated. If the search space or the
+        settings have been changed since by `iter_find` or
+        `assemble_operator`, `find` has to be run again.
+        
+        Parameters
+        ----------
+        indices : numpy.ndarray
+            Indices of the points whose power density has changed, or a
+            boolean mask of shape (N, ).
+        values : numpy.ndarray
+            New power density at these points, either normal of shape
+            (M, ) or non-normalized of shape (M, 3), see `PSPD`. For
+            stacked fields, the fields are stacked along the first axis
+            as in `PSPD`, i.e., the shapes are (F, M) and (F, M, 3).
+        batch_size : int, optional
+            Number of query points processed at once, see `find`.
+        
+        Returns
+        -------
+        numpy.ndarray
+            Indices of the recomputed query points in the point cloud.
+        """
+        search = getattr(self, '_search', None)
+        if search is None:
+            raise ValueError('Update requires an exhaustive search')
+        if isinstance(self.results, dict):
+            results = [self.results[a] for a in search['areas']]
+        else:
+            results = [self.results]
+        if any(not np.array_equal(res.index[:res.size], search['query_ind'])
+               for res in results):
+            raise ValueError('Update requires an exhaustive search')
+
+        # the search state must still be the one that produced results
+        rc = search['radius']
+        if ((self.areas != search['areas'])
+                or (self.engine != search['engine'])
+                or (self._query_ball_radius != rc)
+                or any(res.radius != rc for res in results)
+                or not np.array_equal(self.query_ind, search['query_ind'])):
+            raise ValueError('Search settings changed since `find`, '
+                             'run `find` again before updating')
+        indices = np.atleast_1d(np.arange(self.size)[indices])
+        values = np.asarray(values)
+        if self.n_fields:  # stored with one point per row
+            if ((values.shape[:2] != (self.n_fields, indices.size))
+                    or (values.shape[2:] not in ((), (3, )))):
+                raise ValueError('Stacked values should be of shape '
+                                 '(F, M) or (F, M, 3)')
+            if values.ndim == 3:  # unoriented
+                values = np.einsum('fmk,mk->mf', np.real(values),
+                                   self.normals[indices])
+            else:
+                values = values.T
+        elif (not self.n_fields) and (values.ndim == 2) and (
+            values.shape[1] == 3
+        ):  # unoriented
+            values = np.sum(np.real(values) * self.normals[indices], axis=1)
+        if not getattr(self, '_owns_power_density', False):
+            # copied once, the array may be shared with the caller or
+            # memory-mapped read-only
+            self.power_density_n = np.array(self.power_density_n)
+            self._owns_power_density = True
+        self.power_density_n[indices] = values
+
+        # query points within the ball radius of any changed point
+        if self._query_tree is None:
+            self._query_tree = spatial.KDTree(self.points_visible)
+        near = self._query_tree.query_ball_point(self.points[indices], rc,
+                                                 return_sorted=False)
+        pos = np.unique(np.fromiter(itertools.chain.from_iterable(near),
+                                    dtype=np.intp))
+        with self.stats.time('update'):
+            for i in range(0, pos.size, batch_size):
+                idx = pos[i:i+batch_size]
+                for j, recs in zip(idx, self._step_batch(idx, rc)):
+                    for res, rec in zip(results, recs):
+                        res.replace(j, rec[1], rec[2])
+        self.log.info(f'Recomputed {pos.size} out of {self.query_ind.size} '
+                      'query points')
+        return self.query_ind[pos]
+
+    def assemble_operator(self,
+                          projected_area,
+                          batch_size=128,
+                          roi=None,
+                          **kwargs):
+        """Assembles the sparse spatial-averaging operator for the
+        geometry, so that the spatially averaged power density at every
+        query point of the search space is obtained by a single sparse
+        matrix-vector product for any power density distribution.
+        
+        Each row contains linear quadrature weights over the bounding
+        box of a query point computed from its ball neighbourhood, see
+        `pspd.misc.delaunay_weights`, divided by the estimated surface
+        area. Unlike the smoothing spline used in `find`, the operator
+        is linear in the power density, which makes it reusable at the
+        cost of a somewhat lower accuracy.
+        
+        Parameters
+        ----------
+        projected_area : float
+            Area of the square projection of the evaluation surface,
+            units should correspond to units of the point cloud.
+        batch_size : int, optional
+            Number of query points whose neighbourhoods, local bases
+            and bounding boxes are computed at once.
+        roi : numpy.ndarray or dict, optional
+            Region of interest to which the search space is restricted,
+            see `find`.
+        kwargs : dict, optional
+            Additional keyword arguments for
+            `pspd.points.remove_hidden_points` function to restrict the
+            the number of points and subsequently the search space.
+            The weights are always those of the `delaunay` engine, so
+            that `engine` is not accepted.
+        
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            Operator of shape (M, N), where M is the number of query
+            points, stored in `query_ind`, and N is the number of
+            points. Multiplying it with the normal component of the
+            power density of shape (N, ) or (N, F) for F distributions
+            returns the spatially averaged power density.
+        """
+        if np.iterable(projected_area):
+            raise ValueError('Operator requires a single projected area')
+        if 'engine' in kwargs:
+            raise ValueError('Operator is assembled from `delaunay` '
+                             'weights only')
+        rc = self._setup(projected_area, batch_size, 'delaunay', roi,
+                         **kwargs)
+        P = self.points_visible
+        indptr = [0]
+        indices = []
+        data = []
+        for i in _tqdm(range(0, P.shape[0], batch_size)):
+            idx = np.arange(i, min(i + batch_size, P.shape[0]))
+            for ind, w in self._weights_batch(idx, rc):
+                indices.append(ind)
+                data.append(w)
+                indptr.append(indptr[-1] + ind.size)
+        return sparse.csr_matrix((np.concatenate(data),
+                                  np.concatenate(indices),
+                                  np.array(indptr)),
+                                 shape=(P.shape[0], self.size))
+
+    def get_results(self, peak=True, projected_area=None):
+        results = self.results
+        if isinstance(results, dict):  # several projected areas
+            if projected_area is None:
+                return {a: self.get_results(peak, a) for a in results}
+            results = results[projected_area]
         if peak:
-            peak_results = dict()
-            idx = np.argmax(self.results['spatially averaged power density'])
-            for key in self.results.keys():
-                peak_results[key] = self.results[key][idx]
-            return peak_results
-        return self.results
+            spdn = results['spatially averaged power density']
+            if self.n_fields:  # one peak per field
+                return [results.record(idx, field=f)
+                        for f, idx in enumerate(np.argmax(spdn, axis=0))]
+            return results.record(np.argmax(spdn))
+        return results
     
     def get_points(self, hidden=False):
         if hidden:
@@ -0,0 +1,197 @@
+import numpy as np
+from scipy import spatial
+
+
+KEYS = ('vertices',
+        'triangles',
+        'vtri_indices',
+        'vtri_indptr',
+        'centroids',
+        'areas',
+        'normals',
+        'sub_vertices',
+        'sub_triangles',
+        'sub_areas')
+
+
+def _triangle_geometry(vertices, triangles):
+    v = vertices[triangles]
+    c = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    area = np.linalg.norm(c, axis=1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normal = np.nan_to_num(c / (2 * area[:, np.newaxis]))
+    return v.mean(axis=1), area, normal
+
+
+def subdivide_midpoint(vertices, triangles):
+    """Subdivide each triangle into four by inserting a vertex at the
+    midpoint of every edge.
+
+    Parameters
+    ----------
+    vertices : numpy.ndarray
+        Vertices of shape (V, 3).
+    triangles : numpy.ndarray
+        Triangles given by the indices to the vertices of shape (T, 3).
+
+    Returns
+    -------
+    tuple
+        Vertices of shape (V + E, 3), E is the number of unique edges,
+        with the original vertices first, and triangles of shape
+        (4 * T, 3), where the children of the t-th triangle are stored
+        in rows 4t to 4t + 3.
+    """
+    edges = np.sort(triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    edges, inverse = np.unique(edges, axis=0, return_inverse=True)
+    mid = vertices.shape[0] + inverse.reshape(-1, 3)  # ab, bc, ca
+    a, b, c = triangles.T
+    ab, bc, ca = mid.T
+    children = np.stack([np.c_[a, ab, ca],
+                         np.c_[ab, b, bc],
+                         np.c_[ca, bc, c],
+                         np.c_[ab, bc, ca]], axis=1).reshape(-1, 3)
+    vertices = np.r_[vertices, vertices[edges].mean(axis=1)]
+    return vertices, children.astype(triangles.dtype)
+
+
+class MeshIndex(object):
+    """Arrays derived once from a triangle mesh so that the triangles
+    around any query point are found by array slicing.
+
+    The index holds the vertex-to-triangle adjacency in CSR form,
+    per-triangle centroids, areas and unit normals and, optionally,
+    the mesh subdivided once by the midpoint rule together with the
+    areas of its triangles. All attributes are NumPy arrays, see
+    `arrays`, so that the index can be stored on disk or placed in
+    shared memory.
+    """
+    def __init__(self, arrays):
+        """Constructor.
+
+        Parameters
+        ----------
+        arrays : dict
+            Arrays keyed by the names in `pspd.mesh.KEYS`, as returned
+            by `from_mesh` or `arrays`. The arrays of the subdivided
+            mesh are empty if the subdivision was not requested.
+        """
+        for key in KEYS:
+            setattr(self, key, arrays[key])
+        self._centroid_tree = None  # built on the first query
+
+    def __str__(self):
+        return (f'Mesh index with {self.vertices.shape[0]} vertices and '
+                f'{self.triangles.shape[0]} triangles')
+
+    def __repr__(self):
+        return self.__str__()
+
+    @classmethod
+    def from_mesh(cls, vertices, triangles, subdivide=False):
+        """Build the index from the vertices and triangles of a mesh.
+
+        Parameters
+        ----------
+        vertices : numpy.ndarray
+            Vertices of shape (V, 3).
+        triangles : numpy.ndarray
+            Triangles given by the indices to the vertices of shape
+            (T, 3).
+        subdivide : bool, optional
+            If True, the midpoint subdivision of the mesh is stored as
+            well, see `subdivide_midpoint`.
+
+        Returns
+        -------
+        pspd.mesh.MeshIndex
+            Index of the mesh.
+        """
+        vertices = np.asarray(vertices, dtype=float)
+        triangles = np.asarray(triangles)
+        flat = triangles.ravel()
+        order = np.argsort(flat, kind='stable')
+        count = np.bincount(flat, minlength=vertices.shape[0])
+        centroids, areas, normals = _triangle_geometry(vertices, triangles)
+        if subdivide:
+            sub_vertices, sub_triangles = subdivide_midpoint(vertices,
+                                                             triangles)
+            _, sub_areas, _ = _triangle_geometry(sub_vertices, sub_triangles)
+        else:
+            sub_vertices = np.empty((0, 3))
+            sub_triangles = np.empty((0, 3), dtype=triangles.dtype)
+            sub_areas = np.empty(0)
+        return cls({'vertices': vertices,
+                    'triangles': triangles,
+                    'vtri_indices': order // 3,
+                    'vtri_indptr': np.r_[0, np.cumsum(count)],
+                    'centroids': centroids,
+                    'areas': areas,
+                    'normals': normals,
+                    'sub_vertices': sub_vertices,
+                    'sub_triangles': sub_triangles,
+                    'sub_areas': sub_areas})
+
+    @property
+    def arrays(self):
+        """Dictionary of all arrays of the index keyed by name."""
+        return {key: getattr(self, key) for key in KEYS}
+
+    def near_triangles(self, points, radius):
+        """Return the triangles that may intersect the balls of the
+        given radius, i.e., whose centroids are within the radius
+        extended by the largest distance between a centroid and the
+        vertices of its triangle.
+
+        Parameters
+        ----------
+        points : numpy.ndarray
+            Centers of B balls of shape (B, 3).
+        radius : float
+            Radius of the balls.
+
+        Returns
+        -------
+        list
+            Indices of the triangles for each ball.
+        """
+        if self._centroid_tree is None:
+            self._centroid_tree = spatial.KDTree(self.centroids)
+            self._reach = np.sqrt(np.max(np.sum(
+                (self.vertices[self.triangles]
+                 - self.centroids[:, np.newaxis])**2, axis=-1
+            ), initial=0))
+        return self._centroid_tree.query_ball_point(points,
+                                                    radius + self._reach,
+                                                    return_sorted=False)
+
+    def ball_triangles(self, vind):
+        """Return the triangles with at least one vertex in each of
+        the given sets of vertices.
+
+        Parameters
+        ----------
+        vind : list
+            Sets of vertex indices, e.g., ball neighbourhoods of B
+            query points.
+
+        Returns
+        -------
+        tuple
+            Index of the set in range [0, B), index of the triangle
+            and the number of its vertices within the set, for each
+            unique pair of a set and an adjacent triangle.
+        """
+        size = np.fromiter(map(len, vind), dtype=int, count=len(vind))
+        vflat = np.fromiter((v for ind in vind for v in ind),
+                            dtype=np.intp, count=size.sum())
+        start = self.vtri_indptr[vflat]
+        tsize = self.vtri_indptr[vflat+1] - start
+        ptr = np.r_[0, np.cumsum(tsize)]
+        tind = self.vtri_indices[np.repeat(start - ptr[:-1], tsize)
+                                 + np.arange(ptr[-1])]
+        seg = np.repeat(np.repeat(np.arange(size.size), size), tsize)
+        key, count = np.unique(seg * self.triangles.shape[0] + tind,
+                               return_counts=True)
+        seg, tind = np.divmod(key, self.triangles.shape[0])
+        return seg, tind, count
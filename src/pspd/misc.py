@@ -1,6 +1,5 @@
 import numpy as np
-from scipy import integrate
-from scipy import interpolate
+from scipy import spatial
 
 
 def weightmat(p, nbh, kernel='linear', gamma=None):
@@ -10,9 +9,11 @@ def weightmat(p, nbh, kernel='linear', gamma=None):
     Parameters
     ----------
     p : numpy_ndarray
-        Targeted point of shape (3, ).
+        Targeted point of shape (3, ), or of shape (B, 1, 3) for B
+        neighborhoods at once.
     nbh : numpy.ndarray
-        An array of shape (N, 3) representing the local neighborhood.
+        An array of shape (N, 3) representing the local neighborhood,
+        or of shape (B, N, 3) for B neighborhoods at once.
     kernel : str, optional
         The weighting function to use for MLS fitting. If not set, all
         weights will be set to 1.
@@ -23,9 +24,9 @@ def weightmat(p, nbh, kernel='linear', gamma=None):
     Returns
     -------
     numpy.ndarray
-        Array with weights of (N, ).
+        Array with weights of (N, ), or of (B, N).
     """
-    dist = np.linalg.norm(nbh - p, axis=1)  # squared Euclidian distance
+    dist = np.linalg.norm(nbh - p, axis=-1)  # squared Euclidian distance
     if gamma is None:
         gamma = 1.
     if kernel == 'linear':
@@ -47,11 +48,20 @@ def weightmat(p, nbh, kernel='linear', gamma=None):
     elif kernel == 'rbf':
         w = np.exp(-dist ** 2 / (2 * gamma ** 2))
     elif kernel == 'cosine':
-        w = (nbh @ p) / np.linalg.norm(nbh * p, axis=1)
+        w = np.sum(nbh * p, axis=-1) / np.linalg.norm(nbh * p, axis=-1)
     return w
 
 
-def polyfit2d(x, y, z, deg=1, rcond=None, full_output=False):
+def _exponents(deg, basis):
+    i, j = np.divmod(np.arange((deg + 1) ** 2), deg + 1)
+    if basis == 'tensor':
+        return i, j
+    elif basis == 'total':
+        return i[i+j <= deg], j[i+j <= deg]
+    raise ValueError('Basis is not supported')
+
+
+def polyfit2d(x, y, z, deg=1, rcond=None, full_output=False, basis='tensor'):
     r"""Return the coefficients of a 2-D polynomial of a given degree.
     This function is the 2-D adapted version of `numpy.polyfit`.
     
@@ -61,13 +71,15 @@ def polyfit2d(x, y, z, deg=1, rcond=None, full_output=False):
     
     .. math:: f(x, y) = \sum_{i, j} c_{i, j} x^i y^j
     
-    where `i + j Y= n` and `n` is the degree of a polynomial.
+    where `i, j <= n` for the tensor-product basis, or `i + j <= n` for
+    the total-degree basis, and `n` is the degree of a polynomial.
     
     Parameters
     ----------
-    x, y : array_like, shape (N,)
-        x- and y-oordinates of the M data points `(x[i], y[i])`.
-    z : array_like, shape (M,)
+    x, y : array_like, shape (M,) or (B, M)
+        x- and y-oordinates of the M data points `(x[i], y[i])`. If
+        2-D, B independent fits are solved at once.
+    z : array_like, shape (M,) or (B, M)
         z-coordinates of the M data points.
     deg : int, optional
         Degree of the polynomial to be fit.
@@ -77,32 +89,60 @@ def polyfit2d(x, y, z, deg=1, rcond=None, full_output=False):
     full_output : bool, optional
         Full diagnostic information from the SVD is returned if True,
         otherwise only the fitted coefficients are returned.
+    basis : str, optional
+        If `tensor`, all monomials `x^i y^j` with `i, j <= deg` are
+        fitted. If `total`, only those with `i + j <= deg` are fitted,
+        which is cheaper for the same degree.
         
     Returns
     -------
     numpy.ndarray
-        Array of coefficients of shape (deg+1, deg+1). If `full_output`
-        is set to true, sum of the squared residuals of the fit, the
-        effective rank of the design matrix, its singular values, and
-        the specified value of `rcond` are also returned.
+        Array of coefficients of shape (deg+1, deg+1), or of shape
+        (B, deg+1, deg+1) for B fits, where the coefficients outside
+        of the basis are set to zero. If `full_output` is set to true,
+        sum of the squared residuals of the fit, the effective rank of
+        the design matrix, its singular values, and the specified value
+        of `rcond` are also returned.
     """
     deg = int(deg)
     if deg < 1:
         raise ValueError('Degree must be at least 1.')
+    x, y, z = np.asarray(x), np.asarray(y), np.asarray(z)
+    i, j = _exponents(deg, basis)
     # set up the Vandermode (design) matrix and the intercept vector
     A = np.polynomial.polynomial.polyvander2d(x, y, [deg, deg])
-    b = z.flatten()
+    if basis == 'total':
+        A = A[..., i * (deg+1) + j]
     # set up relative condition of the fit
     if rcond is None:
-        rcond = x.size * np.finfo(x.dtype).eps
+        rcond = x.shape[-1] * np.finfo(x.dtype).eps
     # solve the least square
-    coef, res, rank, s = np.linalg.lstsq(A, b, rcond=rcond)
+    if x.ndim == 1:
+        c, res, rank, s = np.linalg.lstsq(A, z.flatten(), rcond=rcond)
+    else:  # stacked fits share the cutoff rule of `numpy.linalg.lstsq`
+        U, s, Vt = np.linalg.svd(A, full_matrices=False)
+        keep = s > rcond * s[..., :1]
+        Ub = np.einsum('bmr,bm->br', U, z)
+        c = np.einsum('brt,br->bt',
+                      Vt, np.where(keep, Ub / np.where(keep, s, 1), 0))
+        res = np.sum((np.einsum('bmt,bt->bm', A, c) - z) ** 2, axis=-1)
+        rank = keep.sum(axis=-1)
+    coef = np.zeros(x.shape[:-1] + (deg+1, deg+1))
+    coef[..., i, j] = c
     if full_output:
-        return coef.reshape(deg+1, deg+1), res, rank, s
-    return coef.reshape(deg+1, deg+1)
+        return coef, res, rank, s
+    return coef
 
 
-def edblquad(points, values, bbox=None, method=None, **kwargs):
+def edblquad(points,
+             values,
+             bbox=None,
+             method=None,
+             engine='spline',
+             order=8,
+             tol=None,
+             full_output=False,
+             **kwargs):
     """Return the approximate solution to the double integral by
     observing sampled integrand function.
     
@@ -111,21 +151,55 @@ def edblquad(points, values, bbox=None, method=None, **kwargs):
     points : numpy.ndarray
         The point cloud of shape (N, 2), N is the number of points.
     values : numpy.ndarray
-        Sampled integrand of shape (N, 3).
+        Sampled integrand of shape (N, ), or of shape (N, K) for K
+        integrands sampled at the same points. The linear engines
+        integrate all of them with the same weights, while a spline is
+        fitted to each of them.
     bbox : list, optional
         Bounding box that defines integration domain.
     method : string, optional
         If None, the integral is computed by directly integrating
-        splines. Alternative method is `gauss` which utilizes adaptive
-        Gauss-Kronrad quadrature.
+        splines. If `gauss`, the spline is integrated by the
+        tensor-product Gauss-Legendre rule, see `gauss_legendre`.
+        If `dblquad`, the spline is integrated by the adaptive
+        Gauss-Kronrad quadrature in `scipy.integrate.dblquad`, which is
+        slow. Used only by the `spline` engine.
+    engine : string, optional
+        If `spline`, a smoothing bivariate spline is fitted to the
+        integrand. If `delaunay`, `voronoi` or `rbf`, the integral is
+        a weighted sum of the sampled values with the weights given by
+        `delaunay_weights`, `voronoi_weights` or `rbf_weights`,
+        respectively. The weights are linear in the values, so that
+        several integrands share them, but only `rbf` is faster than
+        the spline, as `delaunay` and `voronoi` triangulate the points
+        by Qhull in every call.
+    order : int, optional
+        Number of Gauss-Legendre nodes per dimension, used only if
+        `method` is `gauss`.
+    tol : float, optional
+        Absolute tolerance of the adaptive subdivision of the
+        integration domain, used only if `method` is `gauss`. If None,
+        the domain is not subdivided.
+    full_output : bool, optional
+        If true, the number of warnings raised by the spline fit, e.g.,
+        if the smoothing condition could not be met, is returned as
+        well. It is always 0 for the linear engines.
     kwargs : dict, optional
         Additional keyword arguments for
-        `scipy.interpolate.SmoothBivariateSpline`.
+        `scipy.interpolate.SmoothBivariateSpline` or for the function
+        that returns the weights. If the degrees of the spline, `kx`
+        and `ky`, are not given, they default to 3 and are lowered if
+        there are fewer than 16 points, see `spline_degree`. Given
+        degrees are passed on unchanged.
     
     Returns
     -------
-    float
-        Approximation of the double integral.
+    float or numpy.ndarray
+        Approximation of the double integral, of shape (K, ) for K
+        integrands.
+    int
+        Number of warnings raised by the spline fit, only if
+        `full_output` is true.
     """
     if not isinstance(values, np.ndarray):
         raise Exception('`values` must be array-like.')
@@ -136,19 +210,493 @@ def edblquad(points, values, bbox=None, method=None, **kwargs):
     except TypeError:
         print('`points` must be a 2-column array.')
     else:
+        if engine == 'delaunay':
+            I = delaunay_weights(points, bbox, **kwargs) @ values
+            return (I, 0) if full_output else I
+        elif engine == 'voronoi':
+            I = voronoi_weights(points, bbox, **kwargs) @ values
+            return (I, 0) if full_output else I
+        elif engine == 'rbf':
+            I = rbf_weights(points, bbox, **kwargs) @ values
+            return (I, 0) if full_output else I
+        elif engine != 'spline':
+            raise ValueError('Engine is not supported')
+        if values.ndim == 2:  # a spline is fitted to each integrand
+            out = [edblquad(points, v, bbox, method, engine, order, tol,
+                            full_output=True, **kwargs) for v in values.T]
+            I = np.array([o[0] for o in out])
+            caught = sum(o[1] for o in out)
+            return (I, caught) if full_output else I
+        
+        # lower the default spline degree if there are too few points
+        # for it, explicit degrees are left to the caller
+        deg = spline_degree(points.shape[0])
+        kwargs.setdefault('kx', deg)
+        kwargs.setdefault('ky', deg)
         import warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter('ignore')
+        from scipy import interpolate
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
             f = interpolate.SmoothBivariateSpline(*points.T,
                                                   values,
                                                   bbox=bbox,
                                                   **kwargs)
         if method is None:  # default settings - fast
-            return f.integral(*bbox)
-        if method == 'gauss':  # adaptive Gauss-Kronrad quadrature - slow
+            I = f.integral(*bbox)
+        elif method == 'gauss':  # tensor-product Gauss-Legendre rule
+            I = gauss_legendre(f, bbox, order, tol)
+        elif method == 'dblquad':  # adaptive Gauss-Kronrad quadrature - slow
             from scipy import integrate
-            f_wrap = lambda v, u: f(u, v)
+            f_wrap = lambda v, u: f(u, v, grid=False)
             I, _ = integrate.dblquad(f_wrap, *bbox)
-            return I
         else:  
             raise ValueError('Method is not supported')
+        return (I, len(caught)) if full_output else I
+
+
+def spline_degree(size, k=3):
+    """Return the largest degree of the bivariate spline, at most `k`
+    and at least 1, for which the given number of points is not less
+    than `(degree + 1) ** 2`."""
+    return max(min(k, int(np.sqrt(size)) - 1), 1)
+
+
+def gauss_legendre(f, bbox, order=8, tol=None, max_depth=8):
+    """Return the double integral of a function over a rectangle by
+    the tensor-product Gauss-Legendre rule.
+
+    If the function is a spline, i.e., it has the `get_knots` method,
+    the rectangle is first split into panels at the interior knots, so
+    that the rule is exact for the spline if the number of nodes per
+    dimension is at least half of its degree plus one. Without a
+    tolerance, the function is evaluated on the grid of nodes of all
+    panels in a single call. Otherwise, the panels are subdivided
+    adaptively: every cell is compared against the sum over its four
+    quadrants and the cells that fail the tolerance are split further,
+    with all cells of the same level evaluated in a single call.
+
+    Parameters
+    ----------
+    f : callable
+        Integrand that follows the call signature of
+        `scipy.interpolate.BivariateSpline`, i.e., `f(x, y)` returns
+        the values on the grid spanned by the sorted 1-D arrays `x` and
+        `y`, and `f(x, y, grid=False)` returns the values at the points
+        `(x[i], y[i])`.
+    bbox : list
+        Bounding box that defines integration domain.
+    order : int, optional
+        Number of nodes per dimension.
+    tol : float, optional
+        Absolute tolerance. It is shared among the cells in proportion
+        to their area. If None, the rectangle is not subdivided.
+    max_depth : int, optional
+        Maximum number of subdivisions. The cells that still fail the
+        tolerance contribute their best estimate.
+
+    Returns
+    -------
+    float
+        Approximation of the double integral.
+    """
+    x, w = np.polynomial.legendre.leggauss(order)
+    x0, x1, y0, y1 = bbox
+    # panel edges at the interior knots, on which the spline is smooth
+    tx, ty = f.get_knots() if hasattr(f, 'get_knots') else ([], [])
+    ex = np.unique(np.r_[x0, np.clip(tx, x0, x1), x1])
+    ey = np.unique(np.r_[y0, np.clip(ty, y0, y1), y1])
+    if tol is None:
+        hx, hy = np.diff(ex) / 2, np.diff(ey) / 2
+        X = ((ex[:-1] + hx)[:, np.newaxis] + hx[:, np.newaxis] * x).ravel()
+        Y = ((ey[:-1] + hy)[:, np.newaxis] + hy[:, np.newaxis] * x).ravel()
+        wx = (hx[:, np.newaxis] * w).ravel()
+        wy = (hy[:, np.newaxis] * w).ravel()
+        return wx @ f(X, Y) @ wy
+
+    def rule(cells):
+        hx = (cells[:, 1] - cells[:, 0]) / 2
+        hy = (cells[:, 3] - cells[:, 2]) / 2
+        X = (cells[:, 0] + hx)[:, np.newaxis] + hx[:, np.newaxis] * x
+        Y = (cells[:, 2] + hy)[:, np.newaxis] + hy[:, np.newaxis] * x
+        X, Y = np.broadcast_arrays(X[:, :, np.newaxis], Y[:, np.newaxis, :])
+        F = f(X.ravel(), Y.ravel(), grid=False).reshape(X.shape)
+        return hx * hy * np.einsum('i,j,cij->c', w, w, F)
+
+    def split(cells):
+        xm = (cells[:, 0] + cells[:, 1]) / 2
+        ym = (cells[:, 2] + cells[:, 3]) / 2
+        x0, x1, y0, y1 = cells.T
+        return np.stack([np.c_[x0, xm, y0, ym],
+                         np.c_[xm, x1, y0, ym],
+                         np.c_[x0, xm, ym, y1],
+                         np.c_[xm, x1, ym, y1]], axis=1).reshape(-1, 4)
+
+    cells = np.stack(np.meshgrid(ex[:-1], ey[:-1], indexing='ij')
+                     + np.meshgrid(ex[1:], ey[1:], indexing='ij'),
+                     axis=-1).reshape(-1, 4)[:, [0, 2, 1, 3]]
+    area = (x1 - x0) * (y1 - y0)
+    coarse = rule(cells)
+    I = 0.
+    for _ in range(max_depth):
+        children = split(cells)
+        fine = rule(children).reshape(-1, 4)
+        err = np.abs(fine.sum(axis=1) - coarse)
+        frac = (cells[:, 1] - cells[:, 0]) * (cells[:, 3] - cells[:, 2]) / area
+        done = err <= tol * frac
+        I += fine[done].sum()
+        if done.all():
+            return I
+        cells = children.reshape(-1, 4, 4)[~done].reshape(-1, 4)
+        coarse = fine[~done].ravel()
+    return I + coarse.sum()
+
+
+def clip_polygons(vertices, bbox):
+    """Clip each triangle to the axis-aligned rectangle.
+    
+    Triangles in 3-D are clipped to the infinite prism over the
+    rectangle in the xy-plane, i.e., the z-coordinate is interpolated
+    along the clipped edges.
+    
+    Ref: Sutherland and Hodgman, Communications of the ACM 17(1),
+         pp. 32-42, doi: 10.1145/360767.360802
+    
+    Parameters
+    ----------
+    vertices : numpy.ndarray
+        Vertices of T triangles of shape (T, 3, 2) or (T, 3, 3).
+    bbox : list or numpy.ndarray
+        Rectangle given as [xmin, xmax, ymin, ymax], or one rectangle
+        for each triangle in an array of shape (T, 4).
+    
+    Returns
+    -------
+    tuple
+        Vertices of the clipped polygons of shape (T, M, 2) or
+        (T, M, 3), M is the largest number of vertices, and the number
+        of vertices of each polygon of shape (T, ), zero for triangles
+        that lie entirely outside of the rectangle. Only the leading
+        vertices of each polygon are valid.
+    """
+    poly = np.asarray(vertices, dtype=float)
+    bbox = np.asarray(bbox, dtype=float).reshape(-1, 4)
+    dim = poly.shape[-1]
+    count = np.full(poly.shape[0], 3)
+    rows = np.arange(poly.shape[0])[:, np.newaxis]
+    for axis, bound, sign in [(0, bbox[:, 0:1], 1), (0, bbox[:, 1:2], -1),
+                              (1, bbox[:, 2:3], 1), (1, bbox[:, 3:4], -1)]:
+        m = poly.shape[1]
+        k = np.arange(m)
+        nxt = poly[rows, (k + 1) % np.maximum(count, 1)[:, np.newaxis]]
+        d0 = sign * (poly[..., axis] - bound)
+        d1 = sign * (nxt[..., axis] - bound)
+        edge = k < count[:, np.newaxis]
+        keep = edge & (d0 >= 0)
+        cross = edge & ((d0 >= 0) != (d1 >= 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(cross, d0 / (d0 - d1), 0)
+        inter = poly + t[..., np.newaxis] * (nxt - poly)
+        out = np.stack([poly, inter], axis=2).reshape(poly.shape[0], 2*m,
+                                                      dim)
+        valid = np.stack([keep, cross], axis=2).reshape(poly.shape[0], 2*m)
+        order = np.argsort(~valid, axis=1, kind='stable')
+        poly = out[rows, order]
+        count = valid.sum(axis=1)
+        poly = poly[:, :max(count.max(), 1)]
+    return poly, count
+
+
+def clip_triangles(vertices, bbox):
+    """Return the area and the centroid of each triangle clipped to
+    the axis-aligned rectangle.
+    
+    Triangles in 3-D are clipped to the infinite prism over the
+    rectangle in the xy-plane, see `clip_polygons`, and the area is
+    that of the clipped triangle in space, not of its projection.
+    
+    Parameters
+    ----------
+    vertices : numpy.ndarray
+        Vertices of T triangles of shape (T, 3, 2) or (T, 3, 3).
+    bbox : list or numpy.ndarray
+        Rectangle given as [xmin, xmax, ymin, ymax], or one rectangle
+        for each triangle in an array of shape (T, 4).
+    
+    Returns
+    -------
+    tuple
+        Areas of shape (T, ) and centroids of shape (T, 2) or (T, 3)
+        of the clipped triangles. Centroids of triangles that lie
+        entirely outside of the rectangle are set to zero.
+    """
+    poly, count = clip_polygons(vertices, bbox)
+    dim = poly.shape[-1]
+    rows = np.arange(poly.shape[0])[:, np.newaxis]
+    k = np.arange(poly.shape[1])
+    nxt = poly[rows, (k + 1) % np.maximum(count, 1)[:, np.newaxis]]
+    edge = k < count[:, np.newaxis]
+    if dim == 3:  # fan of triangles around the first vertex of polygons
+        first = poly[:, :1]
+        c = np.cross(poly - first, nxt - first)
+        c = np.where(edge[..., np.newaxis], c, 0)
+        normal = c.sum(axis=1)
+        area = np.linalg.norm(normal, axis=1) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            c = np.einsum('tki,ti->tk', c, normal / (2 * area[:, None]))
+            centroid = np.einsum('tk,tki->ti', c,
+                                 first + poly + nxt) / (6 * area[:, None])
+    else:  # shoelace formula over the clipped polygons
+        c = np.where(edge,
+                     poly[..., 0] * nxt[..., 1] - nxt[..., 0] * poly[..., 1],
+                     0)
+        area = c.sum(axis=1) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            centroid = np.stack([((poly[..., i] + nxt[..., i]) * c).sum(axis=1)
+                                 for i in range(2)],
+                                axis=1) / (6 * area[:, None])
+    centroid[area == 0] = 0
+    return np.abs(area), centroid
+
+
+def clipped_areas(vertices, bbox):
+    """Return the areas of triangles clipped to the axis-aligned
+    rectangle or, in 3-D, to the infinite prism over the rectangle in
+    the xy-plane.
+    
+    Only triangles crossing the boundary of the rectangle are clipped,
+    see `clip_triangles`, those entirely within it keep their full area
+    and those entirely outside of it have zero area.
+    
+    Parameters
+    ----------
+    vertices : numpy.ndarray
+        Vertices of T triangles of shape (T, 3, 2) or (T, 3, 3).
+    bbox : list or numpy.ndarray
+        Rectangle given as [xmin, xmax, ymin, ymax], or one rectangle
+        for each triangle in an array of shape (T, 4).
+    
+    Returns
+    -------
+    numpy.ndarray
+        Areas of the clipped triangles of shape (T, ).
+    """
+    bbox = np.asarray(bbox, dtype=float).reshape(-1, 4)
+    x, y = vertices[..., 0], vertices[..., 1]
+    lo_x, hi_x = x >= bbox[:, 0:1], x <= bbox[:, 1:2]
+    lo_y, hi_y = y >= bbox[:, 2:3], y <= bbox[:, 3:4]
+    inner = (lo_x & hi_x & lo_y & hi_y).all(axis=1)
+    outer = (~lo_x.any(axis=1) | ~hi_x.any(axis=1)
+             | ~lo_y.any(axis=1) | ~hi_y.any(axis=1))
+    area = np.zeros(vertices.shape[0])
+    e1 = vertices[inner, 1] - vertices[inner, 0]
+    e2 = vertices[inner, 2] - vertices[inner, 0]
+    if vertices.shape[-1] == 3:
+        area[inner] = np.linalg.norm(np.cross(e1, e2), axis=1) / 2
+    else:
+        area[inner] = np.abs(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]) / 2
+    boundary = ~inner & ~outer
+    if boundary.any():
+        area[boundary] = clip_triangles(vertices[boundary],
+                                        bbox[boundary] if bbox.shape[0] > 1
+                                        else bbox)[0]
+    return area
+
+
+def delaunay_weights(points, bbox=None):
+    """Return linear quadrature weights for the double integral over the
+    points in a plane.
+    
+    The points are triangulated, the integrand is interpolated linearly
+    over each triangle and the triangles are clipped to the integration
+    domain. The integral of the interpolant over a clipped triangle is
+    its area multiplied by the value at its centroid, which is split
+    among the vertices by the barycentric coordinates of the centroid.
+    Points outside of the bounding box therefore contribute along its
+    edges. Any part of the bounding box that is not covered by the
+    triangulation is accounted for by scaling the weights so that they
+    sum up to the area of the bounding box. The integral of any sampled
+    function is then `weights @ values`.
+    
+    The weights are non-negative, which makes them a robust reference,
+    but not a fast one: every call triangulates the points by Qhull,
+    which takes several times longer than fitting a spline to them.
+    
+    Parameters
+    ----------
+    points : numpy.ndarray
+        The point cloud of shape (N, 2), N is the number of points.
+    bbox : list, optional
+        Bounding box that defines integration domain.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Quadrature weights of shape (N, ).
+    """
+    if not bbox:
+        bbox = [points[:, 0].min(), points[:, 0].max(),
+                points[:, 1].min(), points[:, 1].max()]
+    bbox_area = (bbox[1] - bbox[0]) * (bbox[3] - bbox[2])
+    try:
+        tri = spatial.Delaunay(points)
+    except (spatial.QhullError, ValueError):  # too few or degenerate points
+        return np.full(points.shape[0], bbox_area / max(points.shape[0], 1))
+    v = points[tri.simplices]
+    lo = v.min(axis=1)
+    hi = v.max(axis=1)
+    inner = ((lo[:, 0] >= bbox[0]) & (hi[:, 0] <= bbox[1])
+             & (lo[:, 1] >= bbox[2]) & (hi[:, 1] <= bbox[3]))
+    outer = ((hi[:, 0] < bbox[0]) | (lo[:, 0] > bbox[1])
+             | (hi[:, 1] < bbox[2]) | (lo[:, 1] > bbox[3]))
+    
+    # triangles within the bounding box, each vertex gets a third
+    e1 = v[inner, 1] - v[inner, 0]
+    e2 = v[inner, 2] - v[inner, 0]
+    area = np.abs(e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]) / 2
+    w = np.bincount(tri.simplices[inner].ravel(),
+                    np.repeat(area / 3, 3),
+                    minlength=points.shape[0])
+    
+    # triangles on the boundary of the bounding box are clipped
+    edge = np.where(~inner & ~outer)[0]
+    if edge.size:
+        area, centroid = clip_triangles(v[edge], bbox)
+        T = tri.transform[edge]
+        lam = np.einsum('tij,tj->ti', T[:, :2], centroid - T[:, 2])
+        lam = np.c_[lam, 1 - lam.sum(axis=1)]
+        w += np.bincount(tri.simplices[edge].ravel(),
+                         (area[:, np.newaxis] * lam).ravel(),
+                         minlength=points.shape[0])
+    if w.sum() <= 0:
+        return np.full(points.shape[0], bbox_area / points.shape[0])
+    return w * bbox_area / w.sum()
+
+
+def voronoi_weights(points, bbox=None):
+    """Return quadrature weights for the double integral over the
+    points in a plane as the areas of their Voronoi cells.
+    
+    Each Voronoi cell is triangulated around its point and the
+    triangles are clipped to the integration domain, so that the
+    weight of a point is the area of the part of the bounding box that
+    is closer to it than to any other point. The integrand is thus
+    taken as piecewise constant. Distant auxiliary points ensure that
+    all cells are bounded, and the weights are scaled so that they sum
+    up to the area of the bounding box. The integral of any sampled
+    function is then `weights @ values`.
+    
+    Like `delaunay_weights`, every call runs Qhull, here on the Voronoi
+    diagram, and is the slowest of the engines rather than a faster
+    alternative to the spline.
+    
+    Parameters
+    ----------
+    points : numpy.ndarray
+        The point cloud of shape (N, 2), N is the number of points.
+    bbox : list, optional
+        Bounding box that defines integration domain.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Quadrature weights of shape (N, ).
+    """
+    if not bbox:
+        bbox = [points[:, 0].min(), points[:, 0].max(),
+                points[:, 1].min(), points[:, 1].max()]
+    bbox_area = (bbox[1] - bbox[0]) * (bbox[3] - bbox[2])
+    size = points.shape[0]
+    center = np.array([bbox[0] + bbox[1], bbox[2] + bbox[3]]) / 2
+    r = 10 * (np.ptp(np.r_[points, [bbox[::2], bbox[1::2]]], axis=0).max())
+    far = center + r * np.array([[1, 0], [0, 1], [-1, 0], [0, -1]])
+    try:
+        vor = spatial.Voronoi(np.r_[points, far])
+    except (spatial.QhullError, ValueError):  # too few or degenerate points
+        return np.full(size, bbox_area / max(size, 1))
+    
+    # vertices of each cell ordered by the angle around its point
+    regions = [vor.regions[r] for r in vor.point_region[:size]]
+    count = np.fromiter(map(len, regions), dtype=int, count=size)
+    seg = np.repeat(np.arange(size), count)
+    vert = vor.vertices[np.fromiter((v for r in regions for v in r),
+                                    dtype=np.intp, count=count.sum())]
+    d = vert - points[seg]
+    order = np.lexsort((np.arctan2(d[:, 1], d[:, 0]), seg))
+    vert = vert[order]
+    ptr = np.r_[0, np.cumsum(count)]
+    nxt = np.arange(ptr[-1]) + 1
+    nxt[ptr[1:] - 1] = ptr[:-1]  # close each cell
+    
+    # fan of triangles around each point clipped to the bounding box
+    tri = np.stack([points[seg], vert, vert[nxt]], axis=1)
+    w = np.bincount(seg, clipped_areas(tri, bbox), minlength=size)
+    if w.sum() <= 0:
+        return np.full(size, bbox_area / size)
+    return w * bbox_area / w.sum()
+
+
+def rbf_weights(points, bbox=None, n=None, smoothing=1e-3, stability=20.):
+    """Return quadrature weights for the double integral over the
+    points in a plane by using radial basis functions on a fixed grid.
+    
+    Gaussian radial basis functions are centred on a regular grid of
+    n-by-n nodes spanning the bounding box, with the width equal to
+    the grid spacing. They are fitted to the integrand by regularized
+    least squares and integrated over the bounding box analytically.
+    As the fit is linear in the sampled values, so is the integral,
+    which is then `weights @ values`.
+    
+    If a part of the bounding box holds no points, e.g., at an open
+    boundary of the surface, the fit extrapolates into it and the
+    weights grow without bound. The sum of their absolute values, which
+    equals the area of the bounding box for a stable rule with
+    non-negative weights, is therefore checked and the piecewise-linear
+    weights of `delaunay_weights` are returned instead if it is too
+    large or if the weights do not sum up to a positive area.
+    
+    Parameters
+    ----------
+    points : numpy.ndarray
+        The point cloud of shape (N, 2), N is the number of points.
+    bbox : list, optional
+        Bounding box that defines integration domain.
+    n : int, optional
+        Number of grid nodes along each axis. If not given, there are
+        at most half as many basis functions as points, with up to 8
+        nodes along each axis.
+    smoothing : float, optional
+        Tikhonov regularization relative to the mean diagonal of the
+        normal equations.
+    stability : float, optional
+        Largest ratio of the sum of the absolute weights to the area of
+        the bounding box before falling back to `delaunay_weights`.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Quadrature weights of shape (N, ).
+    """
+    from scipy import special
+    
+    if not bbox:
+        bbox = [points[:, 0].min(), points[:, 0].max(),
+                points[:, 1].min(), points[:, 1].max()]
+    if n is None:
+        n = int(np.clip(np.sqrt(points.shape[0] / 2), 2, 8))
+    phi = []
+    integral = []
+    for axis, (lo, hi) in enumerate([bbox[:2], bbox[2:]]):
+        c = np.linspace(lo, hi, n)
+        h = (hi - lo) / (n - 1)
+        phi.append(np.exp(-((points[:, axis, np.newaxis] - c) / h) ** 2 / 2))
+        integral.append(np.sqrt(np.pi / 2) * h
+                        * (special.erf((hi - c) / (np.sqrt(2) * h))
+                           - special.erf((lo - c) / (np.sqrt(2) * h))))
+    A = (phi[0][:, :, np.newaxis] * phi[1][:, np.newaxis, :]).reshape(-1, n*n)
+    G = A.T @ A
+    G[np.diag_indices_from(G)] += smoothing * np.trace(G) / G.shape[0]
+    w = A @ np.linalg.solve(G, np.outer(*integral).ravel())
+    bbox_area = (bbox[1] - bbox[0]) * (bbox[3] - bbox[2])
+    if (w.sum() <= 0) or (np.abs(w).sum() > stability * bbox_area):
+        return delaunay_weights(points, bbox)
+    return w
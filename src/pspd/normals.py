@@ -1,12 +1,19 @@
+import multiprocessing as mp
+import os
+
 import numpy as np
-import open3d as o3d
+from scipy import sparse
 from scipy import spatial
+from scipy.sparse import csgraph
 
 from .misc import polyfit2d
 from .misc import weightmat
+from .parallel import attach_arrays
+from .parallel import SharedArrays
+from .stats import Stats
 
 
-def orient_normals(points, normals, k):
+def orient_normals(points, normals, k, method='open3d', viewpoint=None):
     """Orient the normals with respect to consistent tangent planes.
     
     Ref: Hoppe et al., in proceedings of SIGGRAPH 1992, pp. 71-78,
@@ -22,17 +29,152 @@ def orient_normals(points, normals, k):
     k : int
         Number of k nearest neighbors used in constructing the
         Riemannian graph used to propagate normal orientation.
+    method : str, optional
+        If `open3d`, the orientation is propagated by
+        `open3d.geometry.PointCloud.orient_normals_consistent_tangent_plane`.
+        If `mst`, the orientation is propagated along the minimum
+        spanning tree of the k-nearest-neighbor graph weighted by
+        `1 - |n_i . n_j|`, and the normal of the highest point of each
+        connected component points upwards. If `radial`, each normal
+        points away from `viewpoint`, which is sufficient for
+        star-shaped bodies, e.g., a head, and takes linear time.
+    viewpoint : numpy.ndarray, optional
+        Point of shape (3, ) used by the `radial` method. If not given,
+        the centroid of the point cloud is used.
     
     Returns
     -------
     numpy.ndarray
         Oriented normals.
     """
-    pcd = o3d.geometry.PointCloud()
-    pcd.points = o3d.utility.Vector3dVector(points)
-    pcd.normals = o3d.utility.Vector3dVector(normals)
-    pcd.orient_normals_consistent_tangent_plane(k)
-    return np.asarray(pcd.normals)
+    if method == 'open3d':
+        import open3d as o3d
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(
+            np.asarray(points, dtype=np.float64)
+        )
+        pcd.normals = o3d.utility.Vector3dVector(
+            np.asarray(normals, dtype=np.float64)
+        )
+        pcd.orient_normals_consistent_tangent_plane(k)
+        return np.asarray(pcd.normals)
+    elif method == 'radial':
+        if viewpoint is None:
+            viewpoint = points.mean(axis=0)
+        flip = np.sum(normals * (points - viewpoint), axis=1) < 0
+        return np.where(flip[:, np.newaxis], -normals, normals)
+    elif method != 'mst':
+        raise ValueError('Orientation method is not supported')
+
+    # symmetric k-nearest-neighbor graph and its minimum spanning tree
+    size = points.shape[0]
+    unit = normals / np.linalg.norm(normals, axis=1, keepdims=True)
+    _, idx = spatial.KDTree(points).query(points, k=k + 1, workers=-1)
+    row = np.repeat(np.arange(size), k)
+    col = idx[:, 1:].ravel()
+    w = 1 - np.abs(np.sum(unit[row] * unit[col], axis=1)) + 1e-12
+    graph = sparse.coo_array((w, (row, col)), shape=(size, size)).tocsr()
+    mst = csgraph.minimum_spanning_tree(graph.maximum(graph.T))
+
+    # breadth-first traversal from the highest point of every component
+    n_comp, label = csgraph.connected_components(mst, directed=False)
+    top = np.lexsort((points[:, 2], label))
+    roots = top[np.r_[np.flatnonzero(np.diff(label[top])), size - 1]]
+    pred = np.full(size, -1)
+    for root in roots:
+        _, p = csgraph.breadth_first_order(mst, root, directed=False,
+                                           return_predecessors=True)
+        pred[p >= 0] = p[p >= 0]
+
+    # sign relative to the parent, multiplied up to the root by pointer
+    # jumping, i.e., a logarithmic number of vectorized steps
+    parent = np.maximum(pred, 0)
+    sign = np.where(np.sum(normals * normals[parent], axis=1) < 0, -1, 1)
+    sign[roots] = np.where(normals[roots, 2] < 0, -1, 1)
+    anc = pred.copy()
+    while (anc >= 0).any():
+        m = anc >= 0
+        sign[m] = sign[m] * sign[anc[m]]
+        anc[m] = anc[anc[m]]
+    return normals * sign[:, np.newaxis]
+
+
+def _morton_order(points, bits=10):
+    extent = max(np.ptp(points, axis=0).max(), 1e-300)
+    q = (points - points.min(axis=0)) / extent
+    q = np.minimum(q * 2 ** bits, 2 ** bits - 1).astype(np.uint64)
+    code = np.zeros(points.shape[0], dtype=np.uint64)
+    for b in range(bits):
+        for a in range(3):
+            code |= ((q[:, a] >> np.uint64(b)) & np.uint64(1)) \
+                << np.uint64(3 * b + a)
+    return np.argsort(code, kind='stable')
+
+
+def _normals_chunk(points, tree, ind, k, deg, unit, kernel, basis, kwargs,
+                   workers=-1, stats=None):
+    if stats is None:
+        stats = Stats()
+    stats.count('normals_points', len(ind))
+    with stats.time('normals_knn'):
+        p = np.asarray(points[ind], dtype=np.float64)
+        _, idx = tree.query(p, k=k, eps=0.1, workers=workers)
+        nbhd = np.asarray(points[idx], dtype=np.float64)
+
+    # change the basis of all local neighborhoods in the chunk
+    with stats.time('normals_pca'):
+        X = nbhd - nbhd.mean(axis=1, keepdims=True)
+        C = np.swapaxes(X, 1, 2) @ X / (k - 1)
+        U, _, _ = np.linalg.svd(C)
+        X_t = X @ U
+
+    # compute weights given specific distance function
+    with stats.time('normals_weights'):
+        if kernel:
+            w = weightmat(p[:, np.newaxis], nbhd, kernel, **kwargs)
+        else:
+            w = np.ones(nbhd.shape[:2])
+
+    # fit parametric surfaces by usign (weighted) 2-D polynomials
+    with stats.time('normals_fit'):
+        X_t_w = X_t * w[..., np.newaxis]
+        c = polyfit2d(*np.moveaxis(X_t_w, 2, 0), deg=deg, basis=basis)
+
+    # compute normals as partial derivatives of the "height" function
+    with stats.time('normals_derivatives'):
+        u, v = X_t_w[:, 0, 0], X_t_w[:, 0, 1]
+        e = np.arange(deg + 1)
+        pu = u[:, np.newaxis] ** np.maximum(e - 1, 0) * e
+        pv = v[:, np.newaxis] ** np.maximum(e - 1, 0) * e
+        ni = np.c_[-np.einsum('bi,bij,bj->b', pu, c, v[:, np.newaxis] ** e),
+                   -np.einsum('bi,bij,bj->b', u[:, np.newaxis] ** e, c, pv),
+                   np.ones(p.shape[0])]
+
+        # convert normal coordinates into the original coordinate frame
+        ni = np.einsum('bij,bj->bi', U, ni)
+
+        # normalize normals by considering the magnitude of each
+        if unit:
+            ni = ni / np.linalg.norm(ni, 2, axis=1, keepdims=True)
+    return ni
+
+
+# per-process state of a pool worker, set by `_init_worker`
+_worker = None
+
+
+def _init_worker(spec, params, enabled=False):
+    global _worker
+    arrays, handles = attach_arrays(spec)
+    points = arrays['points']
+    _worker = (points, spatial.KDTree(points), params, handles,
+               Stats(enabled))
+
+
+def _run_chunk(ind):
+    points, tree, params, _, stats = _worker
+    ni = _normals_chunk(points, tree, ind, workers=1, stats=stats, **params)
+    return ni, stats.drain()
 
 
 def estimate_normals(points,
@@ -41,6 +183,12 @@ def estimate_normals(points,
                      unit=True,
                      kernel=None,
                      orient=False,
+                     basis='tensor',
+                     chunk_size=4096,
+                     n_jobs=1,
+                     out=None,
+                     dtype=None,
+                     stats=None,
                      **kwargs):
     """Return the (unit) normals by fitting 2-D polynomial at each
     point in the point cloud considering its local neighborhood.
@@ -59,6 +207,31 @@ def estimate_normals(points,
         returned.
     kernel : string, optional
         Kernel for computing distance-based weights.
+    orient : bool or str, optional
+        If true, normals are consistently oriented by `open3d`. If
+        string, it is the orientation method, see `orient_normals`.
+    basis : str, optional
+        Polynomial basis, `tensor` or `total`, see
+        `pspd.misc.polyfit2d`.
+    chunk_size : int, optional
+        Number of points whose neighborhoods are fitted at once. Chunks
+        are spatially coherent, i.e., consecutive along the Morton
+        curve, and bound the memory held by the neighbor indices.
+    n_jobs : int, optional
+        Number of worker processes. If greater than 1, the points are
+        placed in shared memory once and every worker builds its own
+        kd-tree over them, see `pspd.parallel.SharedArrays`. If -1, all
+        CPUs are used.
+    out : numpy.ndarray, optional
+        Preallocated array of shape (N, 3), e.g., a `numpy.memmap`, to
+        which the normals are written chunk by chunk.
+    dtype : numpy.dtype, optional
+        Floating-point type of the normals. If not given, the type of
+        `points` is used. Neighborhoods are fitted in double precision
+        regardless.
+    stats : pspd.stats.Stats, optional
+        Instrumentation to which the time of each stage is added, see
+        `pspd.stats.Stats`.
     kwargs : dict, optional
         Additional keyword arguments for computing weights. For details
         see `weightmat` function.
@@ -69,44 +242,37 @@ def estimate_normals(points,
         The (unit) normals of shape (N, 3), where N is the number of
         points in the point cloud.
     """
-    # create a kd-tree for quick nearest-neighbor lookup
-    normals = np.empty_like(points)
-    tree = spatial.KDTree(points)
-    for i, p in enumerate(points):
-        _, idx = tree.query([p], k=k, eps=0.1, workers=-1)
-        nbhd = points[idx.flatten()]
-        
-        # change the basis of the local neighborhood
-        X = nbhd.copy()
-        X = X - X.mean(axis=0)
-        C = (X.T @ X) / (nbhd.shape[0] - 1)
-        U, _, _ = np.linalg.svd(C)
-        X_t = X @ U
-        
-        # compute weights given specific distance function
-        if kernel:
-            w = weightmat(p, nbhd, kernel, **kwargs)
-        else:
-            w = np.ones((nbhd.shape[0], ))
-            
-        # fit parametric surface by usign a (weighted) 2-D polynomial
-        X_t_w = X_t * w[:, np.newaxis]
-        c = polyfit2d(*X_t_w.T, deg=deg)
-        
-        # compute normals as partial derivatives of the "height" function
-        cu = np.polynomial.polynomial.polyder(c, axis=0)
-        cv = np.polynomial.polynomial.polyder(c, axis=1)
-        ni = np.array([-np.polynomial.polynomial.polyval2d(*X_t_w[0, :2], cu),
-                       -np.polynomial.polynomial.polyval2d(*X_t_w[0, :2], cv),
-                       1])
-        
-        # convert normal coordinates into the original coordinate frame
-        ni = U @ ni
-        
-        # normalize normals by considering the magnitude of each
-        if unit:
-            ni = ni / np.linalg.norm(ni, 2)
-        normals[i, :] = ni
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    if stats is None:
+        stats = Stats()
+    if out is None:
+        normals = np.empty_like(points, dtype=dtype)
+    else:
+        normals = out
+    order = _morton_order(points)
+    chunks = [order[i:i+chunk_size]
+              for i in range(0, points.shape[0], chunk_size)]
+    params = {'k': k, 'deg': deg, 'unit': unit, 'kernel': kernel,
+              'basis': basis, 'kwargs': kwargs}
+    if n_jobs > 1:
+        with SharedArrays({'points': points}) as shared, mp.Pool(
+            n_jobs,
+            initializer=_init_worker,
+            initargs=(shared.spec, params, stats.enabled),
+        ) as pool:
+            for ind, (ni, st) in zip(chunks, pool.imap(_run_chunk, chunks)):
+                normals[ind] = ni
+                stats.merge(st)
+    else:
+        # create a kd-tree for quick nearest-neighbor lookup
+        with stats.time('normals_kdtree'):
+            tree = spatial.KDTree(points)
+        for ind in chunks:
+            normals[ind] = _normals_chunk(points, tree, ind, stats=stats,
+                                          **params)
     if orient:
-        normals = orient_normals(points, normals, k)
+        method = 'open3d' if orient is True else orient
+        with stats.time('normals_orient'):
+            normals[...] = orient_normals(points, normals, k, method)
     return normals
@@ -0,0 +1,180 @@
+import mmap
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import spatial
+
+from .mesh import KEYS as MESH_KEYS
+from .mesh import MeshIndex
+from .stats import Stats
+
+
+# per-process state of a pool worker, set by `_init_worker`
+_worker = None
+
+
+def _file_backed(arr):
+    return (isinstance(arr, np.memmap)
+            and isinstance(arr.base, mmap.mmap)
+            and (arr.filename is not None)
+            and arr.flags.c_contiguous)
+
+
+class SharedArrays(object):
+    """Context manager that copies arrays into shared memory once so
+    that pool workers can attach to them instead of receiving pickled
+    copies. Arrays memory-mapped from a file, e.g., by `numpy.load` or
+    `pspd.io.load`, are not copied, the workers map the same file."""
+    def __init__(self, arrays):
+        """Constructor.
+
+        Parameters
+        ----------
+        arrays : dict
+            Arrays to be shared, keyed by name.
+        """
+        self.shm = []
+        self.spec = dict()
+        for name, arr in arrays.items():
+            if _file_backed(arr):
+                self.spec[name] = (arr.filename, arr.shape, arr.dtype.str,
+                                   arr.offset)
+                continue
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True,
+                                             size=max(arr.nbytes, 1))
+            buf = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+            buf[...] = arr
+            self.shm.append(shm)
+            self.spec[name] = (shm.name, arr.shape, arr.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for shm in self.shm:
+            shm.close()
+            shm.unlink()
+
+
+def attach_arrays(spec):
+    """Return the arrays described by the `spec` attribute of
+    `SharedArrays` without copying them.
+
+    Parameters
+    ----------
+    spec : dict
+        Shared memory name, shape and dtype, or file name, shape, dtype
+        and offset, for each array.
+
+    Returns
+    -------
+    tuple
+        Dictionary of arrays and the list of shared memory handles
+        that must be kept alive for as long as the arrays are used.
+    """
+    arrays = dict()
+    handles = []
+    for name, (shm_name, shape, dtype, *offset) in spec.items():
+        if offset:  # memory-mapped file
+            arrays[name] = np.memmap(shm_name, dtype=dtype, mode='r',
+                                     offset=offset[0], shape=shape)
+            continue
+        shm = shared_memory.SharedMemory(name=shm_name)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        handles.append(shm)
+    return arrays, handles
+
+
+def _init_worker(spec, attrs, frames):
+    from .main import PSPD
+
+    global _worker
+    arrays, handles = attach_arrays(spec)
+    obj = PSPD.__new__(PSPD)
+    obj.points = arrays['points']
+    obj.normals = arrays['normals']
+    obj.power_density_n = arrays['power_density_n']
+    obj.points_visible = arrays['query']
+    for name, value in attrs.items():  # search settings set up by `find`
+        setattr(obj, name, value)
+    obj.tree = spatial.KDTree(obj.points)
+    if 'mesh_vertices' in arrays:
+        obj.mesh_index = MeshIndex({key: arrays[f'mesh_{key}']
+                                    for key in MESH_KEYS})
+        # workers only test for the mesh, the surface areas are computed
+        # from the index, so that open3d is never imported
+        obj.mesh = True
+        obj.vert = obj.mesh_index.vertices
+        if obj.mesh_area == 'approximate':  # vertex balls
+            obj.vtree = spatial.KDTree(obj.vert)
+    else:
+        obj.mesh = None
+    if frames is None:
+        obj._frames = None
+    else:  # memory-map the geometry cache
+        obj._frames = {name: np.load(path, mmap_mode='r')
+                       for name, path in frames.items()}
+    obj._shared = handles
+    _worker = obj
+
+
+def _run_batch(bounds):
+    idx = np.arange(*bounds)
+    out = list(_worker._step_batch(idx, _worker._query_ball_radius))
+    return out, _worker.stats.drain()
+
+
+def map_batches(obj, batch_size, n_jobs):
+    """Evaluate `PSPD._step_batch` over all visible points of `obj` in
+    a pool of processes.
+
+    Points, normals, normal power density, query points and, if
+    available, the mesh index, see `pspd.mesh.MeshIndex`, are placed
+    in shared memory once and attached to by every worker. Ball
+    neighbourhoods and local bases from the geometry cache, if used,
+    are memory-mapped by every worker. Statistics collected by the
+    workers are merged into `obj.stats`, see `pspd.stats.Stats`.
+
+    Parameters
+    ----------
+    obj : pspd.PSPD
+        Instance with the search space already set up by `find`.
+    batch_size : int
+        Number of query points in a single task.
+    n_jobs : int
+        Number of worker processes.
+
+    Yields
+    ------
+    list
+        Compact records of a single batch of query points, see
+        `PSPD._step_batch`. Batches are yielded in the order of the
+        visible points.
+    """
+    arrays = {'points': obj.points,
+              'normals': obj.normals,
+              'power_density_n': obj.power_density_n,
+              'query': obj.points_visible}
+    if obj.mesh:
+        for key, arr in obj.mesh_index.arrays.items():
+            arrays[f'mesh_{key}'] = arr
+    size = obj.points_visible.shape[0]
+    bounds = [(i, min(i + batch_size, size))
+              for i in range(0, size, batch_size)]
+    attrs = {name: getattr(obj, name)
+             for name in ['areas', 'projected_area', 'mesh_area', 'engine']}
+    attrs['stats'] = Stats(obj.stats.enabled)  # merged batch by batch
+    if obj._frames is None:
+        frames = None
+    else:
+        frames = {name: arr.filename for name, arr in obj._frames.items()}
+    with SharedArrays(arrays) as shared, mp.Pool(
+        n_jobs,
+        initializer=_init_worker,
+        initargs=(shared.spec, attrs, frames),
+    ) as pool:
+        for out, stats in pool.imap(_run_batch, bounds):
+            obj.stats.merge(stats)
+            yield out
@@ -23,9 +23,89 @@ def remove_hidden_points(xyz, pov, p=np.pi):
     numpy.ndarray
         Indices of the directly visible points in a point cloud.
     """
-    xyzt = xyz - pov  # move pov to the origin
+    xyzt = np.asarray(xyz, dtype=np.float64) - pov  # move pov to the origin
     norm = np.linalg.norm(xyzt, axis=1)[:, np.newaxis]
     R = norm.max() * 10 ** p
     xyzf = xyzt + 2 * (R - norm) * (xyzt / norm) # perform spherical flip
     hull = spatial.ConvexHull(np.append(xyzf, [[0,0,0]], axis=0))
     return hull.vertices[:-1]
+
+
+def region_of_interest(xyz,
+                       mask=None,
+                       box=None,
+                       sphere=None,
+                       values=None,
+                       threshold=None):
+    """Return the mask of points within the region of interest given
+    as the intersection of all specified criteria.
+    
+    Parameters
+    ----------
+    xyz : numpy.ndarray
+        The point cloud of shape (N, 3), N is the number of points.
+    mask : numpy.ndarray, optional
+        Boolean mask of shape (N, ) or indices of the points.
+    box : tuple, optional
+        Lower and upper corner of an axis-aligned box, each of shape
+        (3, ).
+    sphere : tuple, optional
+        Center of shape (3, ) and radius of a sphere.
+    values : numpy.ndarray, optional
+        Values of shape (N, ) compared against `threshold`, e.g., the
+        power density.
+    threshold : float, optional
+        Fraction of the maximum of `values` below which the points are
+        excluded.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Boolean mask of shape (N, ).
+    """
+    roi = np.ones(xyz.shape[0], dtype=bool)
+    if mask is not None:
+        mask = np.asarray(mask)
+        if mask.dtype != bool:  # indices of the points
+            mask = np.isin(np.arange(xyz.shape[0]), mask)
+        roi &= mask
+    if box is not None:
+        lower, upper = box
+        roi &= np.all((xyz >= lower) & (xyz <= upper), axis=1)
+    if sphere is not None:
+        center, radius = sphere
+        roi &= np.sum((xyz - center) ** 2, axis=1) <= radius ** 2
+    if threshold is not None:
+        if values is None:
+            raise ValueError('Threshold requires values')
+        roi &= values >= threshold * np.max(values)
+    return roi
+
+
+def voxel_downsample(xyz, voxel_size):
+    """Return the indices of points that represent the occupied voxels
+    of a regular grid, one point per voxel.
+    
+    Parameters
+    ----------
+    xyz : numpy.ndarray
+        The point cloud of shape (N, 3), N is the number of points.
+    voxel_size : float
+        Edge length of a voxel.
+    
+    Returns
+    -------
+    numpy.ndarray
+        Sorted indices of points that are the closest to the centroid
+        of the points within their voxel.
+    """
+    key = np.floor((xyz - xyz.min(axis=0)) / voxel_size).astype(np.int64)
+    _, inv, count = np.unique(key, axis=0,
+                              return_inverse=True,
+                              return_counts=True)
+    inv = inv.ravel()
+    centroid = np.stack([np.bincount(inv, c) for c in xyz.T], axis=1)
+    centroid /= count[:, np.newaxis]
+    dist = np.linalg.norm(xyz - centroid[inv], axis=1)
+    order = np.lexsort((dist, inv))
+    return np.sort(order[np.r_[0, np.cumsum(count)[:-1]]])
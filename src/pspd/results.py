@@ -0,0 +1,198 @@
+from collections.abc import Mapping
+from collections.abc import Sequence
+
+import numpy as np
+
+
+KEYS = ('query point',
+        'k-neighbourhood',
+        'k-neighbourhood normals',
+        'evaluation surface',
+        'surface area',
+        'power density',
+        'spatially averaged power density')
+
+
+class _LazyColumn(Sequence):
+    """Read-only sequence whose items are rebuilt on access."""
+    def __init__(self, results, key):
+        self._results = results
+        self._key = key
+
+    def __len__(self):
+        return self._results.size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('Result index out of range')
+        return self._results._rebuild(self._key, i)
+
+
+class Results(Mapping):
+    """Compact store of the results of the search algorithm.
+
+    Only per-point scalars (index of the query point, surface area and
+    spatially averaged power density) and the local frame (centroid,
+    basis and bounding box) are kept in preallocated arrays, while the
+    points within each bounding box are kept as indices into the point
+    cloud in CSR form. Neighbourhoods, their normals, power density and
+    evaluation surfaces are rebuilt on access. The store behaves like
+    the dictionary of lists returned by earlier versions.
+    """
+    def __init__(self, owner, capacity=1024, radius=None):
+        """Constructor.
+
+        Parameters
+        ----------
+        owner : pspd.PSPD
+            Instance whose points, normals and power density the
+            stored indices refer to.
+        capacity : int, optional
+            Number of query points for which memory is preallocated.
+            The capacity is doubled whenever it is exhausted.
+        radius : float, optional
+            Radius of the ball neighbourhood used during the search.
+        """
+        self.owner = owner
+        self.radius = radius
+        self.size = 0
+        self.nnz = 0
+        if owner.size < np.iinfo(np.int32).max:
+            self._itype = np.int32
+        else:
+            self._itype = np.int64
+        capacity = max(int(capacity), 1)
+        self.index = np.empty(capacity, dtype=np.intp)
+        self.area = np.empty(capacity)
+        fields = () if owner.n_fields is None else (owner.n_fields, )
+        self.spdn = np.empty((capacity, ) + fields)
+        self.mu = np.empty((capacity, 3))
+        self.mapper = np.empty((capacity, 3, 3))
+        self.bbox = np.empty((capacity, 4))
+        self.indptr = np.zeros(capacity + 1, dtype=np.int64)
+        self.indices = np.empty(capacity * 64, dtype=self._itype)
+
+    def __str__(self):
+        return f'Results for {self.size} query points'
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __getitem__(self, key):
+        if key == 'query point':
+            return self.owner.points[self.index[:self.size]]
+        elif key == 'surface area':
+            return self.area[:self.size]
+        elif key == 'spatially averaged power density':
+            return self.spdn[:self.size]
+        elif key in KEYS:
+            return _LazyColumn(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(KEYS)
+
+    def __len__(self):
+        return len(KEYS)
+
+    def _grow(self, size, nnz):
+        if size > self.index.size:
+            capacity = max(size, 2 * self.index.size)
+            for name in ['index', 'area', 'spdn', 'mu', 'mapper', 'bbox']:
+                arr = getattr(self, name)
+                new = np.empty((capacity, ) + arr.shape[1:], dtype=arr.dtype)
+                new[:self.size] = arr[:self.size]
+                setattr(self, name, new)
+            indptr = np.zeros(capacity + 1, dtype=np.int64)
+            indptr[:self.size+1] = self.indptr[:self.size+1]
+            self.indptr = indptr
+        if nnz > self.indices.size:
+            capacity = max(nnz, 2 * self.indices.size)
+            indices = np.empty(capacity, dtype=self._itype)
+            indices[:self.nnz] = self.indices[:self.nnz]
+            self.indices = indices
+
+    def append(self, index, ind, area, spdn, mu, mapper, bbox):
+        """Store the outcome of the spatial averaging at a single query
+        point.
+
+        Parameters
+        ----------
+        index : int
+            Index of the query point in the point cloud.
+        ind : numpy.ndarray
+            Indices of the points within the bounding box.
+        area : float
+            Estimated surface area.
+        spdn : float or numpy.ndarray
+            Spatially averaged power density, of shape (F, ) for F
+            stacked fields.
+        mu : numpy.ndarray
+            Centroid of the neighbourhood of shape (3, ).
+        mapper : numpy.ndarray
+            Orthonormal basis of the neighbourhood of shape (3, 3).
+        bbox : list
+            Bounding box in the local frame.
+        """
+        i = self.size
+        self._grow(i + 1, self.nnz + len(ind))
+        self.index[i] = index
+        self.area[i] = area
+        self.spdn[i] = spdn
+        self.mu[i] = mu
+        self.mapper[i] = mapper
+        self.bbox[i] = bbox
+        self.indices[self.nnz:self.nnz+len(ind)] = ind
+        self.nnz += len(ind)
+        self.indptr[i+1] = self.nnz
+        self.size += 1
+
+    def replace(self, i, area, spdn):
+        """Overwrite the surface area and the spatially averaged power
+        density of the i-th query point, e.g., after the power density
+        has changed. Its neighbourhood and local frame are kept."""
+        self.area[i] = area
+        self.spdn[i] = spdn
+
+    def neighbourhood(self, i):
+        """Return the indices of points within the bounding box of the
+        i-th query point."""
+        return self.indices[self.indptr[i]:self.indptr[i+1]]
+
+    def _rebuild(self, key, i):
+        ind = self.neighbourhood(i)
+        if key == 'query point':
+            return self.owner.points[self.index[i]]
+        elif key == 'k-neighbourhood':
+            return self.owner.points[ind]
+        elif key == 'k-neighbourhood normals':
+            return self.owner.normals[ind]
+        elif key == 'power density':
+            return self.owner.power_density_n[ind]
+        elif key == 'evaluation surface':
+            owner = self.owner
+            if owner.mesh:
+                vind = owner._mesh_ball(owner.points[self.index[i]][np.newaxis],
+                                        self.radius)[0]
+            else:
+                vind = None
+            nbht = owner._map(owner.points[ind] - self.mu[i], self.mapper[i])
+            return owner._domain(nbht, owner.normals[ind], list(self.bbox[i]),
+                                 self.mu[i], self.mapper[i], vind)
+        return self[key][i]
+
+    def record(self, i, field=None):
+        """Return all results for the i-th query point as a dictionary.
+        For stacked fields, only the power density and its spatial
+        average of the given field are returned if `field` is set.
+        """
+        rec = {key: self._rebuild(key, i) for key in KEYS}
+        if field is not None:
+            for key in ['power density', 'spatially averaged power density']:
+                rec[key] = np.take(rec[key], field, axis=-1)
+        return rec
@@ -0,0 +1,208 @@
+import contextlib
+import json
+import time
+
+import numpy as np
+
+
+# histogram buckets are powers of two, sizes above the last one are
+# counted only in the `+Inf` bucket
+BUCKETS = 2 ** np.arange(21)
+
+# shared by all disabled instances, so that a disabled stage costs a
+# single attribute lookup and an empty context
+_NULL = contextlib.nullcontext()
+
+
+class _Timer(object):
+    __slots__ = ('stats', 'stage', 'start')
+
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        seconds = self.stats.seconds
+        seconds[self.stage] = seconds.get(self.stage, 0.) + elapsed
+        calls = self.stats.calls
+        calls[self.stage] = calls.get(self.stage, 0) + 1
+
+
+class Stats(object):
+    """Opt-in instrumentation of the hot paths.
+
+    Cumulative wall time and number of calls are collected per stage,
+    together with counters and histograms of sizes, e.g., of the ball
+    neighbourhoods. A disabled instance collects nothing and its stages
+    cost a shared empty context, so that it can be left in place.
+    """
+    def __init__(self, enabled=False):
+        """Constructor.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            If true, statistics are collected. It may be toggled at any
+            time.
+        """
+        self.enabled = enabled
+        self.reset()
+
+    def __str__(self):
+        return f'Statistics of {len(self.seconds)} stages'
+
+    def __repr__(self):
+        return self.__str__()
+
+    def reset(self):
+        """Discard the collected statistics."""
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self.histograms = {}
+
+    def time(self, stage):
+        """Return the context that adds its wall time to the stage.
+
+        Parameters
+        ----------
+        stage : str
+            Name of the stage.
+
+        Returns
+        -------
+        context manager
+            Timer of the stage, or an empty context if disabled.
+        """
+        if self.enabled:
+            return _Timer(self, stage)
+        return _NULL
+
+    def count(self, name, value=1):
+        """Increment the counter by the value."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def observe(self, name, values):
+        """Add the sizes to the histogram.
+
+        Parameters
+        ----------
+        name : str
+            Name of the histogram.
+        values : int or numpy.ndarray
+            Observed non-negative sizes.
+        """
+        if not self.enabled:
+            return
+        values = np.atleast_1d(values)
+        bins = np.searchsorted(BUCKETS, values)  # BUCKETS.size is +Inf
+        hist = self.histograms.setdefault(
+            name, {'counts': np.zeros(BUCKETS.size + 1, dtype=np.int64),
+                   'sum': 0}
+        )
+        hist['counts'] += np.bincount(bins, minlength=BUCKETS.size + 1)
+        hist['sum'] += int(values.sum())
+
+    def merge(self, other):
+        """Add the statistics collected by another instance, e.g., in
+        a worker process."""
+        for stage, seconds in other.seconds.items():
+            self.seconds[stage] = self.seconds.get(stage, 0.) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + other.calls[stage]
+        for name, value in other.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for name, hist in other.histograms.items():
+            if name in self.histograms:
+                self.histograms[name]['counts'] += hist['counts']
+                self.histograms[name]['sum'] += hist['sum']
+            else:
+                self.histograms[name] = {'counts': hist['counts'].copy(),
+                                         'sum': hist['sum']}
+
+    def drain(self):
+        """Return the collected statistics and reset this instance."""
+        out = Stats(self.enabled)
+        out.seconds, out.calls = self.seconds, self.calls
+        out.counters, out.histograms = self.counters, self.histograms
+        self.reset()
+        return out
+
+    def to_dict(self):
+        """Return the statistics as a JSON-serializable dictionary.
+
+        Histograms are given by the cumulative number of observations
+        less than or equal to each bucket boundary, the last one being
+        `+Inf`.
+        """
+        le = [str(b) for b in BUCKETS.tolist()] + ['+Inf']
+        return {
+            'stages': {stage: {'seconds': seconds,
+                               'calls': self.calls[stage]}
+                       for stage, seconds in self.seconds.items()},
+            'counters': dict(self.counters),
+            'histograms': {
+                name: {'buckets': dict(zip(le, np.cumsum(
+                           hist['counts']).tolist())),
+                       'sum': hist['sum'],
+                       'count': int(hist['counts'].sum())}
+                for name, hist in self.histograms.items()
+            },
+        }
+
+    def to_json(self, fname=None):
+        """Return the statistics in JSON and optionally write them to
+        the file."""
+        text = json.dumps(self.to_dict(), indent=2)
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_prometheus(self, fname=None, prefix='pspd'):
+        """Return the statistics in the Prometheus text exposition
+        format and optionally write them to the file, e.g., in the
+        directory of the textfile collector of the node exporter.
+
+        Parameters
+        ----------
+        fname : str, optional
+            Path to the output file.
+        prefix : str, optional
+            Prefix of the metric names.
+
+        Returns
+        -------
+        str
+            Stages are exported as the counters `<prefix>_stage_seconds`
+            and `<prefix>_stage_calls` labelled by the stage, counters
+            as `<prefix>_<name>` and histograms as `<prefix>_<name>`.
+        """
+        d = self.to_dict()
+        lines = []
+        for metric, key, help in [
+            ('stage_seconds', 'seconds', 'Cumulative wall time per stage.'),
+            ('stage_calls', 'calls', 'Number of calls per stage.'),
+        ]:
+            lines += [f'# HELP {prefix}_{metric}_total {help}',
+                      f'# TYPE {prefix}_{metric}_total counter']
+            lines += [f'{prefix}_{metric}_total{{stage="{stage}"}} {s[key]}'
+                      for stage, s in d['stages'].items()]
+        for name, value in d['counters'].items():
+            lines += [f'# TYPE {prefix}_{name}_total counter',
+                      f'{prefix}_{name}_total {value}']
+        for name, hist in d['histograms'].items():
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            lines += [f'{prefix}_{name}_bucket{{le="{le}"}} {count}'
+                      for le, count in hist['buckets'].items()]
+            lines += [f'{prefix}_{name}_sum {hist["sum"]}',
+                      f'{prefix}_{name}_count {hist["count"]}']
+        text = '\n'.join(lines) + '\n'
+        if fname is not None:
+            with open(fname, 'w') as f:
+                f.write(text)
+        return text
@@ -0,0 +1,311 @@
+import logging
+import sys
+
+import numpy as np
+
+from .io import load
+from .io import load_npz
+from .io import save_npz
+from .main import PSPD
+from .points import region_of_interest
+
+
+log = logging.getLogger(__package__)
+
+
+def _bounds(points, chunk_size):
+    lower = np.full(3, np.inf)
+    upper = np.full(3, -np.inf)
+    for i in range(0, points.shape[0], chunk_size):
+        chunk = np.asarray(points[i:i+chunk_size], dtype=np.float64)
+        lower = np.minimum(lower, chunk.min(axis=0))
+        upper = np.maximum(upper, chunk.max(axis=0))
+    return lower, upper
+
+
+def iter_tiles(points, tile_size, halo, shard=0, n_shards=1,
+               chunk_size=1 << 20):
+    """Split the point cloud into the cells of a regular grid, each
+    extended by a halo, and yield the cells of a single shard.
+
+    Cells are enumerated in the lexicographic order of their grid
+    coordinates and the i-th non-empty cell belongs to the shard
+    `i % n_shards`, so that every shard job derives the same split
+    from the same point cloud independently of the others. The points
+    are read chunk by chunk, and the split holds a single cell id and
+    a single index per point, i.e., 16 bytes per point, besides the
+    points of the yielded cell and its neighbours.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        The point cloud of shape (N, 3), N is the number of points,
+        e.g., memory-mapped from a file.
+    tile_size : float
+        Edge length of a cell.
+    halo : float
+        Width of the halo around each cell.
+    shard : int, optional
+        Index of the shard in range [0, n_shards).
+    n_shards : int, optional
+        Number of shards.
+    chunk_size : int, optional
+        Number of points read at once.
+
+    Yields
+    ------
+    tuple
+        Index of the cell, sorted indices of the points within the
+        cell and sorted indices of the points within the cell extended
+        by the halo.
+    """
+    origin, upper = _bounds(points, chunk_size)
+    shape = np.floor((upper - origin) / tile_size).astype(np.int64) + 1
+    if np.prod(shape.astype(float)) >= np.iinfo(np.int64).max:
+        raise ValueError('Too many cells, increase the tile size')
+    # one cell id per point, raveled in the lexicographic order of the
+    # grid coordinates
+    cell = np.empty(points.shape[0], dtype=np.int64)
+    for i in range(0, points.shape[0], chunk_size):
+        chunk = np.asarray(points[i:i+chunk_size], dtype=np.float64)
+        grid = np.floor((chunk - origin) / tile_size).astype(np.int64)
+        np.minimum(grid, shape - 1, out=grid)  # rounding at the upper edge
+        cell[i:i+chunk_size] = (grid[:, 0] * shape[1]
+                                + grid[:, 1]) * shape[2] + grid[:, 2]
+    order = np.argsort(cell, kind='stable')
+    cell = cell[order]
+    start = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+    cells = cell[start]
+    ptr = np.r_[start, cell.size]
+    del cell
+    reach = int(np.ceil(halo / tile_size))
+    offsets = np.stack(np.meshgrid(*[np.arange(-reach, reach + 1)] * 3,
+                                   indexing='ij'), axis=-1).reshape(-1, 3)
+    for i in range(shard, cells.size, n_shards):
+        grid = np.array(np.unravel_index(cells[i], shape))
+        near = grid + offsets
+        near = near[np.all((near >= 0) & (near < shape), axis=1)]
+        near = np.ravel_multi_index(near.T, shape)
+        j = np.searchsorted(cells, near)
+        j = j[(j < cells.size) & (cells[np.minimum(j, cells.size - 1)]
+                                  == near)]
+        core = np.sort(order[ptr[i]:ptr[i+1]])
+        cand = np.concatenate([order[ptr[k]:ptr[k+1]] for k in j])
+        lower = origin + grid * tile_size - halo
+        upper = lower + tile_size + 2 * halo
+        inside = np.all((points[cand] >= lower) & (points[cand] <= upper),
+                        axis=1)
+        yield i, core, np.sort(cand[inside])
+
+
+def find_tiled(points,
+               power_density,
+               normals,
+               projected_area,
+               tile_size,
+               shard=0,
+               n_shards=1,
+               output=None,
+               roi=None,
+               batch_size=128,
+               engine='spline',
+               dtype=np.float64):
+    """Compute the spatially averaged power density tile by tile so
+    that the geometry and the power density of only a single tile and
+    its halo are held in memory at once.
+
+    Each tile is extended by a halo as wide as the radius of the ball
+    neighbourhood, so that the neighbourhoods of the points within
+    the tile are complete, and it is searched exhaustively by its own
+    `pspd.PSPD` instance. The points are fetched tile by tile, e.g.,
+    from memory-mapped files, see `pspd.io.load`. The split into tiles
+    itself holds 16 bytes per point, see `iter_tiles`, and a region of
+    interest a boolean mask over the whole point cloud.
+
+    Parameters
+    ----------
+    points : numpy.ndarray
+        The point cloud of shape (N, 3), N is the number of points.
+    power_density : numpy.ndarray
+        Power density distribution, see `pspd.PSPD`, possibly several
+        fields stacked in an array of shape (F, N) or (F, N, 3).
+    normals : numpy.ndarray
+        Non-normalized normals of shape (N, 3), estimated beforehand
+        on the whole point cloud, e.g., by
+        `pspd.normals.estimate_normals` with a memory-mapped output,
+        so that their orientation is consistent across tiles.
+    projected_area : float
+        Area of the square projection of the evaluation surface.
+    tile_size : float
+        Edge length of a tile. It should be several times larger than
+        the edge of the projected area, as the halo adds its ball
+        radius on each side.
+    shard : int, optional
+        Index of the shard computed by this call, see `iter_tiles`.
+    n_shards : int, optional
+        Number of shards, e.g., jobs on different nodes.
+    output : str, optional
+        Path to the `.npz` file to which the results of the shard are
+        written, see `merge_tiles`.
+    roi : numpy.ndarray or dict, optional
+        Region of interest on the whole point cloud, see
+        `pspd.PSPD.find`. A relative threshold requires the normal
+        power density of shape (N, ) or (F, N), in which case it is
+        relative to the maximum of each field. The hidden point removal
+        is not supported as it requires the whole point cloud.
+    batch_size : int, optional
+        Number of query points processed at once, see `pspd.PSPD.find`.
+    engine : str, optional
+        Integration engine, see `pspd.PSPD.find`.
+    dtype : numpy.dtype, optional
+        Floating-point type of each tile, see `pspd.PSPD`.
+
+    Returns
+    -------
+    dict
+        Indices of the query points in the whole point cloud, their
+        surface areas and spatially averaged power density, of shape
+        (M, F) for stacked fields.
+    """
+    if normals is None:
+        raise ValueError('Tiled search requires normals')
+    size = points.shape[0]
+    stacked = (power_density.ndim == 3) or (
+        (power_density.ndim == 2) and (power_density.shape[0] != size)
+    )
+    fields = (power_density.shape[0], ) if stacked else ()
+    if isinstance(roi, dict):
+        values = power_density
+        if 'threshold' in roi:
+            if (values.ndim == 3) or ((values.ndim == 2) and not stacked):
+                raise ValueError('Threshold requires the normal power '
+                                 'density')
+            if stacked:  # relative to the maximum of each field
+                values = np.max(values / np.max(values, axis=1,
+                                                keepdims=True), axis=0)
+        roi = region_of_interest(points, values=values, **roi)
+    elif roi is not None:
+        roi = region_of_interest(points, mask=roi)
+    halo = np.sqrt(2) / 2 * np.sqrt(projected_area)
+    index, area, spdn = [], [], []
+    for i, core, region in iter_tiles(points, tile_size, halo, shard,
+                                      n_shards):
+        query = np.isin(region, core)
+        if roi is not None:
+            query &= roi[region]
+        if not query.any():
+            continue
+        if region.size <= 10:
+            log.warning(f'Tile {i} with {region.size} points is skipped')
+            continue
+        tile = PSPD(points[region],
+                    power_density[:, region] if stacked
+                    else power_density[region],
+                    normals=normals[region],
+                    dtype=dtype)
+        tile.find(projected_area,
+                  batch_size=batch_size,
+                  engine=engine,
+                  roi=query)
+        res = tile.results
+        index.append(region[res.index[:res.size]])
+        area.append(res['surface area'].copy())
+        spdn.append(res['spatially averaged power density'].copy())
+        log.info(f'Tile {i}: {res.size} query points, {region.size} points')
+    out = {'index': np.concatenate(index) if index else np.empty(0, int),
+           'surface area': np.concatenate(area) if area else np.empty(0),
+           'spatially averaged power density': (np.concatenate(spdn) if spdn
+                                                else np.empty((0, ) + fields))}
+    if output is not None:
+        save_npz(output, **{key.replace(' ', '_'): value
+                            for key, value in out.items()})
+    return out
+
+
+def merge_tiles(shards):
+    """Combine the results of all shards into the averaged-field map
+    over the whole point cloud.
+
+    Parameters
+    ----------
+    shards : list
+        Results returned by `find_tiled`, or paths to the `.npz` files
+        written by it.
+
+    Returns
+    -------
+    dict
+        Indices of the query points in the whole point cloud in the
+        ascending order, their surface areas and spatially averaged
+        power density, and the index of the peak value, or of shape
+        (F, ) with one peak per field for stacked fields.
+    """
+    parts = []
+    for shard in shards:
+        if isinstance(shard, str):
+            shard = {key.replace('_', ' '): np.asarray(value)
+                     for key, value in load_npz(shard, None).items()}
+        parts.append(shard)
+    index = np.concatenate([p['index'] for p in parts])
+    order = np.argsort(index, kind='stable')
+    if np.any(np.diff(index[order]) == 0):
+        raise ValueError('Shards overlap')
+    out = {key: np.concatenate([p[key] for p in parts])[order]
+           for key in ['index',
+                       'surface area',
+                       'spatially averaged power density']}
+    spdn = out['spatially averaged power density']
+    if spdn.size == 0:
+        out['peak'] = None
+    else:  # along the query points, one peak per field if stacked
+        out['peak'] = out['index'][np.argmax(spdn, axis=0)]
+    return out
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog='python -m pspd.tiles',
+        description='Tiled search run as independent shard jobs.',
+    )
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('run', help='compute a single shard')
+    run.add_argument('--points', required=True)
+    run.add_argument('--power-density', required=True)
+    run.add_argument('--normals', required=True)
+    run.add_argument('--area', type=float, required=True,
+                     help='projected area')
+    run.add_argument('--tile-size', type=float, required=True)
+    run.add_argument('--shard', type=int, default=0)
+    run.add_argument('--n-shards', type=int, default=1)
+    run.add_argument('--engine', default='spline')
+    run.add_argument('--roi', help='file with a mask or point indices')
+    run.add_argument('--output', required=True, help='shard .npz file')
+    merge = sub.add_parser('merge', help='merge shard files')
+    merge.add_argument('shards', nargs='+')
+    merge.add_argument('--output', required=True, help='merged .npz file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'run':
+        find_tiled(load(args.points),
+                   load(args.power_density),
+                   load(args.normals),
+                   args.area,
+                   args.tile_size,
+                   shard=args.shard,
+                   n_shards=args.n_shards,
+                   output=args.output,
+                   roi=load(args.roi) if args.roi else None,
+                   engine=args.engine)
+    else:
+        out = merge_tiles(args.shards)
+        log.info(f'Peak at point {out["peak"]}')
+        save_npz(args.output, **{key.replace(' ', '_'): value
+                                 for key, value in out.items()
+                                 if key != 'peak'})
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])